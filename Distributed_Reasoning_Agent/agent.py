@@ -1,4 +1,5 @@
 import os
+import re
 import json
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
@@ -11,22 +12,84 @@ console = Console()
 # Load API keys
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+DECOMPOSITION_PROMPT = """Break down this problem into clear sub-tasks based on complexity (at most {max_tasks}).
+For each sub-task give a meaningful and concise name for the agent responsible for it.
+Respond with JSON only, in this form:
+{{"sub_agents": [{{"name": "Agent Name", "task": "Sub-task title", "depends_on": ["Name of an earlier agent"]}}]}}
+"depends_on" lists earlier agents whose findings this task needs; leave it empty if there are none.
+
+Problem: {problem}"""
+
+def unique_name(name, taken):
+    """`name`, or `name 2`, `name 3`, ... when it is already in `taken`; the returned name is added to `taken`."""
+    candidate, n = name, 1
+    while candidate in taken:
+        n += 1
+        candidate = f"{name} {n}"
+    taken.add(candidate)
+    return candidate
+
+def parse_decomposition(content, max_tasks):
+    """
+    Parse the JSON decomposition into [{"name", "task", "depends_on"}]. Items without a task are dropped and
+    repeated names are numbered. Returns None only when the reply is not JSON at all.
+    """
+    text = re.sub(r"^```(?:json)?|```$", "", content.strip(), flags=re.MULTILINE).strip()
+    start = min([i for i in (text.find("{"), text.find("[")) if i != -1], default=-1)
+    if start == -1:
+        return None
+    try:
+        data, _ = json.JSONDecoder().raw_decode(text[start:])
+    except ValueError:
+        # A reply that starts as JSON is broken JSON, not a list of sub-tasks; prose may just contain a brace
+        return [] if start == 0 else None
+    items = data.get("sub_agents", data.get("tasks")) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return []
+
+    plan, taken = [], set()
+    for item in items:
+        if len(plan) == max_tasks:
+            break
+        if not isinstance(item, dict) or not str(item.get("task") or "").strip():
+            continue
+        depends_on = item.get("depends_on") if isinstance(item.get("depends_on"), list) else []
+        # Keep only dependencies on earlier agents, so the plan can always run in order
+        depends_on = [d for d in dict.fromkeys(map(str, depends_on)) if d in taken]
+        name = str(item.get("name") or "").strip()
+        plan.append({
+            "name": unique_name(name, taken) if name else "",
+            "task": str(item["task"]).strip(),
+            "depends_on": depends_on,
+        })
+    return plan
+
 class DistributedReasoningAgent:
     def __init__(self, model="mixtral-8x7b-32768", max_sub_agents=5):
         self.llm = ChatGroq(model_name=model, groq_api_key=GROQ_API_KEY)
         self.max_sub_agents = max_sub_agents
+        self.plan = []
         self.sub_agents = []
 
     def generate_sub_tasks(self, user_input):
-        """Generate sub-tasks dynamically based on the user input."""
+        """Generate sub-tasks, agent names and dependencies in a single structured LLM call."""
         console.print(f"[bold cyan]Step 1: Problem Decomposition[/bold cyan]")
         response = self.llm.invoke([
-            SystemMessage(content="You are an expert task decomposer."),
-            HumanMessage(content=f"Break down this problem into {self.max_sub_agents} clear sub-tasks. Only provide the sub-task titles, without any descriptions: {user_input}")
+            SystemMessage(content="You are an expert task decomposer. You reply with JSON only."),
+            HumanMessage(content=DECOMPOSITION_PROMPT.format(max_tasks=self.max_sub_agents, problem=user_input))
         ])
         
-        sub_tasks = response.content.strip().split("\n")
-        sub_tasks = [task.strip() for task in sub_tasks if task.strip()]
+        plan = parse_decomposition(response.content, self.max_sub_agents)
+        self.plan = plan or []
+        if self.plan:
+            sub_tasks = [entry["task"] for entry in self.plan]
+        elif plan is None:
+            # Fall back to one sub-task per line; agents are then named in create_sub_agents
+            console.print("[yellow]Decomposition was not JSON; falling back to line-separated sub-tasks.[/yellow]")
+            sub_tasks = [task.strip() for task in response.content.strip().split("\n") if task.strip()]
+        else:
+            console.print("[yellow]Decomposition had no usable sub-tasks; treating the whole problem as one.[/yellow]")
+            sub_tasks = [user_input]
         
         console.print(f"[bold cyan]Generated Sub-Tasks:[/bold cyan]")
         for i, task in enumerate(sub_tasks[:self.max_sub_agents], 1):
@@ -35,29 +98,37 @@ class DistributedReasoningAgent:
         return sub_tasks[:self.max_sub_agents]
 
     def create_sub_agents(self, sub_tasks):
-        """Create sub-agents based on the generated sub-tasks."""
+        """Create sub-agents for the sub-tasks, using the names from the decomposition where available."""
         console.print(f"[bold cyan]Step 2: Sub-Agent Creation and Task Assignment[/bold cyan]")
-        for task in sub_tasks:
-            response = self.llm.invoke([
-                SystemMessage(content="You are an expert in naming agents based on their tasks."),
-                HumanMessage(content=f"Generate a meaningful and concise name for an agent responsible for this task. "
-                                 f"Only provide the name, without any description: {task}")
-        ])
-            agent_name = response.content.strip()
+        planned = self.plan if [entry["task"] for entry in self.plan] == list(sub_tasks) else [{}] * len(sub_tasks)
+        taken = {agent.name for agent in self.sub_agents}
+        for task, entry in zip(sub_tasks, planned):
+            # Results are keyed by agent name, so generated names must not repeat
+            agent_name = unique_name(entry.get("name") or self.name_agent(task), taken)
 
-            sub_agent = SubAgent(agent_name, task, self.llm)
+            sub_agent = SubAgent(agent_name, task, self.llm, depends_on=entry.get("depends_on", []))
             self.sub_agents.append(sub_agent)
             
             console.print(f"- {agent_name}")
 
+    def name_agent(self, task):
+        """Ask the LLM for an agent name; only used when the decomposition did not provide one."""
+        response = self.llm.invoke([
+            SystemMessage(content="You are an expert in naming agents based on their tasks."),
+            HumanMessage(content=f"Generate a meaningful and concise name for an agent responsible for this task. "
+                                 f"Only provide the name, without any description: {task}")
+        ])
+        return response.content.strip()
+
     def execute(self):
         """Execute the problem-solving process."""
         console.print("[bold cyan]Step 3: Task Execution[/bold cyan]")
+        results = {}
         for agent in self.sub_agents:
-            agent.execute_task()
+            agent.execute_task({name: results[name] for name in agent.depends_on if name in results})
+            results[agent.name] = agent.result
 
         console.print("[bold cyan]Step 4: Result Synthesis and Summarization[/bold cyan]")
-        results = {agent.name: agent.result for agent in self.sub_agents}
         
         summarized_solution = self.summarize_results(results)
         console.print(f"[bold cyan]Summarized Solution:[/bold cyan]")
@@ -90,18 +161,27 @@ class DistributedReasoningAgent:
         return {"🌟 Final Solution 🌟": response.content}
     
 class SubAgent:
-    def __init__(self, name, task, llm):
+    def __init__(self, name, task, llm, depends_on=None):
         self.name = name
         self.task = task
         self.llm = llm
+        self.depends_on = depends_on or []
         self.result = None
 
-    def execute_task(self):
+    def build_message(self, context=None):
+        """Task instruction, preceded by the findings of the agents this one depends on."""
+        message = f"Perform this task: {self.task}"
+        if context:
+            findings = "\n".join(f"{name}: {result}" for name, result in context.items())
+            message = f"Findings from earlier agents:\n{findings}\n\n{message}"
+        return message
+
+    def execute_task(self, context=None):
         """Execute the task assigned to this sub-agent."""
         console.print(f"[yellow]🔄 Executing {self.name}...[/yellow]")
         response = self.llm.invoke([
             SystemMessage(content=f"Role: {self.name}"),
-            HumanMessage(content=f"Perform this task: {self.task}")
+            HumanMessage(content=self.build_message(context))
         ])
         self.result = response.content
         console.print(f"[bold green]✔ Findings from {self.name}:[/bold green] {self.result}")
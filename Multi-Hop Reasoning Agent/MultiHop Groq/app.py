@@ -1,11 +1,13 @@
 from rich.console import Console
 from rich.panel import Panel
 from groq import Groq
-from config import API_KEY
+from config import API_KEY, API_BASE_URL
 from query_parser import QueryParser
-from parallel_pipeline import ParallelReasoningPipeline
-from data_sources import SQLDataSource, DocumentParser, APIDataSource
-from processing import CompetitorProcessor, MarketTrendsProcessor, SalesProcessor, FeedbackProcessor, SummarizationProcessor
+from planner import StepPlanner
+from insight_cache import InsightCache
+from data_sources import DocumentParser, APIDataSource
+from sales_features import SalesFeatureSource
+from processing import CompetitorProcessor, MarketTrendsProcessor, CorrelationProcessor, SalesProcessor, FeedbackProcessor, SummarizationProcessor
 
 console = Console()
 
@@ -21,41 +23,51 @@ def main():
     tasks = query_parser.parse(query)
     console.print(Panel(f"Parsed Tasks: {tasks}", title="Query Parsing", border_style="cyan"))
 
-    # Initialize the pipeline
-    pipeline = ParallelReasoningPipeline()
-
-    # ✅ Remove hardcoded step numbers & let dynamic numbering handle it
-    pipeline.add_step(
-        "Retrieve and analyze sales data for Product X",
-        SQLDataSource("sales.db", "SELECT * FROM sales WHERE product='Product X'"),
-        SalesProcessor(groq_client),
-        "SQL Database", "blue"
+    # Register every step the agent can run, tagged with what it can answer; the planner keeps only the steps the
+    # parsed targets ask for, and steps analyzed within the last 15 minutes reuse their stored insight
+    planner = StepPlanner(cache=InsightCache(), max_age=15 * 60)
+    api_url = lambda path: f"{API_BASE_URL}/{path}" if API_BASE_URL else f"mock://{path}"
+    planner.register(
+        "sales", ("sales", "revenue", "units sold", "decline", "drop", "performance", "quarter", "region", "channel"),
+        "Retrieve and analyze sales data for Product X", "SQL Database", "blue",
+        lambda: SalesFeatureSource("sales.db", "sales", "product = ?", ("Product X",)),
+        lambda: SalesProcessor(groq_client)
     )
-    pipeline.add_step(
-        "Retrieve and analyze customer feedback for Product X",
-        DocumentParser("feedback.pdf"),
-        FeedbackProcessor(groq_client),
-        "Document", "green"
+    planner.register(
+        "feedback", ("customer feedback", "sentiment", "reviews", "complaints", "satisfaction", "quality", "durability"),
+        "Retrieve and analyze customer feedback for Product X", "Document", "green",
+        lambda: DocumentParser("feedback.pdf"),
+        lambda: FeedbackProcessor(groq_client, query_terms=tasks)
     )
-    pipeline.add_step(
-        "Retrieve and analyze competitor data",
-        APIDataSource("mock://competitors"),
-        CompetitorProcessor(groq_client),
-        "API", "yellow"
+    planner.register(
+        "competitors", ("competitor", "competition", "rival", "pricing", "price", "market share"),
+        "Retrieve and analyze competitor data", "API", "yellow",
+        lambda: APIDataSource(api_url("competitors")),
+        lambda: CompetitorProcessor(groq_client)
     )
-    pipeline.add_step(
-        "Retrieve and analyze market trends",
-        APIDataSource("mock://market-trends"),
-        MarketTrendsProcessor(groq_client),
-        "API", "red"
+    planner.register(
+        "market_trends", ("market trends", "demand", "industry", "consumer preferences", "sustainability", "seasonality"),
+        "Retrieve and analyze market trends", "API", "red",
+        lambda: APIDataSource(api_url("market-trends")),
+        lambda: MarketTrendsProcessor(groq_client)
     )
+    # Second hop: runs as soon as the planned analyses above have produced their insights
+    planner.register(
+        "correlation", ("factors", "drivers", "driving", "causes", "reasons", "why", "explain", "impact"),
+        "Correlate sales, feedback, competitor and market findings", "Previous Steps", "magenta",
+        None,
+        lambda: CorrelationProcessor(groq_client),
+        inputs={"sales": "sales", "feedback": "feedback", "competitors": "competitors", "market_trends": "market_trends"}
+    )
+    pipeline = planner.build(tasks)
+    console.print(Panel(f"Planned Steps: {[step['name'] for step in pipeline.steps]}", title="Step Planning", border_style="cyan"))
 
-    # Run the pipeline
-    insights = pipeline.run()
-
-    # Summarize results using LLM
+    # Run the pipeline, folding each insight into the summary using LLM as soon as its step completes
     summarizer = SummarizationProcessor(groq_client)
-    final_summary = summarizer.process(insights)
+    pipeline.run(summarizer=summarizer)
+    pipeline.print_trace()
+
+    final_summary = pipeline.summary or "No insights were produced."
 
     console.print(Panel(final_summary, title="[bold]Final Summary[/bold]", border_style="magenta"))
 
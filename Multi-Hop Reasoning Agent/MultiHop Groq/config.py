@@ -4,4 +4,6 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-API_KEY = os.getenv("API_KEY")
\ No newline at end of file
+API_KEY = os.getenv("API_KEY")
+# Base URL of the competitor / market-trend API (e.g. http://127.0.0.1:8765 for stub_server.py); unset uses mock data
+API_BASE_URL = os.getenv("API_BASE_URL")
\ No newline at end of file
@@ -1,27 +1,129 @@
+import os
+import json
 import sqlite3
+import hashlib
+import asyncio
+import threading
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 from PyPDF2 import PdfReader
+from retrieval import CorpusIndex, DOCUMENT_EXTENSIONS
+from http_client import DEFAULT_TTL, HTTP_CACHE_DIR, ResponseCache, iter_pages, run_sync
+
+
+class SQLiteConnectionPool:
+    """Keeps one SQLite connection per (thread, database, mode), reused across fetches."""
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = []
+
+    def get(self, db_path, read_only=False, wal=False):
+        cache = self.local.__dict__.setdefault("connections", {})
+        key = (db_path, read_only, wal)
+        if key not in cache:
+            if read_only:
+                conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+            else:
+                conn = sqlite3.connect(db_path, check_same_thread=False)
+                if wal:
+                    # WAL lets readers run alongside a writer; it needs write access to switch modes
+                    conn.execute("PRAGMA journal_mode=WAL")
+            cache[key] = conn
+            with self.lock:
+                self.connections.append(conn)
+        return cache[key]
+
+    def close_all(self):
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections.clear()
+        self.local = threading.local()
+
+
+connection_pool = SQLiteConnectionPool()
+
+
+def db_stat(db_path):
+    """Size and mtime of an SQLite database and its WAL file; changes with every committed write."""
+    return [[os.stat(path).st_size, os.stat(path).st_mtime_ns] if os.path.exists(path) else None
+            for path in (db_path, db_path + "-wal")]
+
 
 class SQLDataSource:
     """Handles retrieving data from an SQLite database."""
-    def __init__(self, db_path, query):
+    def __init__(self, db_path, query, params=(), read_only=False, wal=False, chunk_size=None):
         self.db_path = db_path
         self.query = query
+        self.params = params
+        self.read_only = read_only
+        self.wal = wal
+        self.chunk_size = chunk_size
 
     def fetch_data(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(self.query)
-        data = cursor.fetchall()
-        conn.close()
-        return {"sql_data": data}
+        """Returns all rows, or a lazy stream of row chunks when chunk_size is set."""
+        cursor = self._execute()
+        columns = [c[0] for c in cursor.description]
+        if self.chunk_size:
+            return {"sql_chunks": self._iter_chunks(cursor), "columns": columns}
+        try:
+            return {"sql_data": cursor.fetchall(), "columns": columns}
+        finally:
+            cursor.close()
+
+    def fingerprint(self):
+        """Changes when the database or the query changes."""
+        return [db_stat(self.db_path), self.query, list(self.params)]
+
+    def _execute(self):
+        conn = connection_pool.get(self.db_path, self.read_only, self.wal)
+        return conn.execute(self.query, self.params)
+
+    def _iter_chunks(self, cursor):
+        try:
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+# Extracted PDF text is cached here, one JSONL file (a line per page) per file hash and mtime
+PDF_CACHE_DIR = os.path.join(".cache", "pdf_text")
+# PDFs with at least this many pages are extracted in parallel across processes
+PARALLEL_PAGE_THRESHOLD = 32
+PAGES_PER_TASK = 8
+
+
+def _extract_page_range(file_path, start, stop):
+    """Extracts pages [start, stop) in a worker process (each worker opens its own reader)."""
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+@lru_cache(maxsize=256)
+def _file_digest(file_path, size, mtime_ns):
+    """SHA-256 of a file. Size and mtime are part of the key, so each version of a file is hashed once per process."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
 
 class DocumentParser:
-    """Handles extracting text data from PDF documents."""
-    def __init__(self, file_path):
+    """Handles extracting text data from PDF documents, or indexing a directory of documents for retrieval."""
+    def __init__(self, file_path, cache_dir=PDF_CACHE_DIR, max_workers=None):
         self.file_path = file_path
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
 
     def fetch_data(self):
+        if os.path.isdir(self.file_path):
+            return self._fetch_corpus()
         if self.file_path.endswith(".pdf"):
             text = self._parse_pdf()
         else:
@@ -29,20 +131,169 @@ class DocumentParser:
         return {"document_text": text}
 
     def _parse_pdf(self):
+        return "".join(self.iter_pages())
+
+    def fingerprint(self):
+        """The PDF's hash and mtime, or path, size and mtime of every document in a directory."""
+        if not os.path.isdir(self.file_path):
+            return os.path.basename(self.cache_path())
+        return [[os.path.join(root, name), os.stat(os.path.join(root, name)).st_size, os.stat(os.path.join(root, name)).st_mtime_ns]
+                for root, _, files in sorted(os.walk(self.file_path)) for name in sorted(files)
+                if name.lower().endswith(DOCUMENT_EXTENSIONS)]
+
+    def _fetch_corpus(self):
+        """Updates the retrieval index over a directory of documents and returns it instead of the full text."""
+        index = CorpusIndex(self.file_path, os.path.join(os.path.dirname(self.cache_dir) or ".", "corpus_index.db"))
+        changed, added = index.update(self._read_document)
+        return {"corpus": index, "changed_documents": changed, "indexed_chunks": added}
+
+    def _read_document(self, path):
+        if path.lower().endswith(".pdf"):
+            return "".join(DocumentParser(path, self.cache_dir, self.max_workers).iter_pages())
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+
+    def cache_path(self):
+        """Cache file for the current contents of the PDF: keyed by its SHA-256 and modification time."""
+        stat = os.stat(self.file_path)
+        return os.path.join(self.cache_dir, f"{_file_digest(self.file_path, stat.st_size, stat.st_mtime_ns)}-{stat.st_mtime_ns}.jsonl")
+
+    def iter_pages(self):
+        """Yields page texts lazily: from the cache if present, otherwise extracted (and cached) as they complete."""
+        cache_path = self.cache_path()
+        if os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as out:
+                for text in self._extract_pages():
+                    out.write(json.dumps(text, ensure_ascii=False) + "\n")
+                    yield text
+            os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _extract_pages(self):
         reader = PdfReader(self.file_path)
-        text = "".join([page.extract_text() for page in reader.pages])
-        return text
+        page_count = len(reader.pages)
+        if page_count < PARALLEL_PAGE_THRESHOLD:
+            for page in reader.pages:
+                yield page.extract_text() or ""
+            return
+        # Large PDF: batches of pages run across all cores; map() keeps page order and yields each batch as it is ready
+        starts = range(0, page_count, PAGES_PER_TASK)
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            batches = executor.map(_extract_page_range, [self.file_path] * len(starts), starts,
+                                   [min(start + PAGES_PER_TASK, page_count) for start in starts])
+            for batch in batches:
+                yield from batch
+
+
+# Marks the end of one endpoint's records in aiter_records(); a page may hold JSON null records
+_DONE = object()
+
+
+def _endpoint_key(url):
+    """Data key for an endpoint: the last path segment, e.g. .../market-trends -> market_trends."""
+    return url.split("?")[0].rstrip("/").rsplit("/", 1)[-1].replace("-", "_")
+
+
+def _page_records(body):
+    if isinstance(body, list):
+        return body
+    if isinstance(body, dict):
+        for key in ("items", "data", "results"):
+            if isinstance(body.get(key), list):
+                return body[key]
+    return [body]
+
+
+def format_records(records):
+    """One line per JSON record ("field: value; ..."), the text form the processors analyze."""
+    return "\n".join("; ".join(f"{k}: {v}" for k, v in record.items()) if isinstance(record, dict) else str(record)
+                     for record in records)
 
 
 class APIDataSource:
-    """Handles API data retrieval for competitor and market data."""
-    def __init__(self, api_url):
+    """
+    Handles API data retrieval for competitor and market data: the built-in mock:// payloads, or JSON over HTTP.
+    HTTP responses are cached on disk for `ttl` seconds and then revalidated (ETag / Last-Modified); pages are
+    followed through "next" links, and with several endpoints ({data key: URL}) all are fetched concurrently.
+    """
+
+    def __init__(self, api_url, key=None, ttl=DEFAULT_TTL, max_pages=None, cache_dir=HTTP_CACHE_DIR):
         self.api_url = api_url
+        self.endpoints = dict(api_url) if isinstance(api_url, dict) else {key or _endpoint_key(api_url): api_url}
+        self.mock = isinstance(api_url, str) and api_url.startswith("mock://")
+        self.ttl = ttl
+        self.max_pages = max_pages
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.validators = {}
+        self.prefetched = None
+
+    def fingerprint(self):
+        """
+        The mock payloads are static, so the payload is its own fingerprint; over HTTP, the validators of every page.
+        The validators come from a real fetch, whose data the next fetch_data() call returns instead of fetching again.
+        """
+        if self.mock:
+            return self.fetch_data()
+        self.prefetched = self.fetch_data()
+        return dict(self.validators)
 
     def fetch_data(self):
+        if not self.mock:
+            return run_sync(self.afetch_data())
         if "competitors" in self.api_url:
             return {"competitors": "Competitors in Region A offer durable products at competitive prices."}
         elif "market-trends" in self.api_url:
             return {"market_trends": "Growing demand for sustainable and durable products in Region A."}
         else:
-            raise ValueError("Invalid API URL")
\ No newline at end of file
+            raise ValueError("Invalid API URL")
+
+    async def afetch_data(self):
+        if self.mock:
+            return self.fetch_data()
+        if self.prefetched is not None:
+            data, self.prefetched = self.prefetched, None
+            return data
+        records = {key: [] for key in self.endpoints}
+        async for key, record in self.aiter_records():
+            records[key].append(record)
+        return {key: format_records(rows) for key, rows in records.items()}
+
+    async def aiter_records(self):
+        """Yields (data key, record) as pages arrive; endpoints are fetched concurrently, pages in order."""
+        queue = asyncio.Queue()
+
+        async def fetch(key, url):
+            validators = []
+            try:
+                async for page in iter_pages(url, self.cache, self.ttl, self.max_pages):
+                    validators.append(page["etag"] or page["last_modified"] or hashlib.sha256(
+                        json.dumps(page["body"], sort_keys=True).encode("utf-8")).hexdigest())
+                    for record in _page_records(page["body"]):
+                        await queue.put((key, record))
+                self.validators[key] = validators
+            finally:
+                await queue.put((key, _DONE))
+
+        tasks = [asyncio.create_task(fetch(key, url)) for key, url in self.endpoints.items()]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                key, record = await queue.get()
+                if record is _DONE:
+                    remaining -= 1
+                else:
+                    yield key, record
+            await asyncio.gather(*tasks)  # Re-raise HTTP errors
+        finally:
+            for task in tasks:
+                task.cancel()
\ No newline at end of file
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+
+# Responses are cached here with their ETag / Last-Modified, one JSON file per URL
+HTTP_CACHE_DIR = os.path.join(".cache", "http")
+# Seconds a cached response is served without revalidation
+DEFAULT_TTL = 300
+MAX_CONNECTIONS = 10
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 30.0
+
+_clients = {}
+_background = {"loop": None}
+_lock = threading.Lock()
+
+
+def client():
+    """The httpx.AsyncClient of the running event loop, created on first use and reused for every request on it."""
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        import httpx  # Only needed for http(s) sources
+        _clients[loop] = httpx.AsyncClient(
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+            follow_redirects=True
+        )
+    return _clients[loop]
+
+
+async def close_clients():
+    """Closes the client of the running event loop; call before the loop ends."""
+    http_client = _clients.pop(asyncio.get_running_loop(), None)
+    if http_client is not None:
+        await http_client.aclose()
+
+
+def run_sync(coroutine):
+    """
+    Runs a coroutine from blocking code on one long-lived background loop, so synchronous callers
+    (e.g. pipeline worker threads) share that loop's connection pool.
+    """
+    with _lock:
+        if _background["loop"] is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="http-client", daemon=True).start()
+            _background["loop"] = loop
+    return asyncio.run_coroutine_threadsafe(coroutine, _background["loop"]).result()
+
+
+class ResponseCache:
+    """On-disk JSON responses with their validators and fetch time."""
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + ".json")
+
+    def get(self, url):
+        try:
+            with open(self.path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, entry):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.path(url)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path(url))
+
+
+def next_link(response, body):
+    """URL of the next page: a "next" field in the JSON body, or a Link header with rel="next"."""
+    if isinstance(body, dict) and body.get("next"):
+        return str(response.url.join(body["next"]))
+    link = response.links.get("next")
+    return str(response.url.join(link["url"])) if link else None
+
+
+async def get_json(url, cache, ttl=DEFAULT_TTL):
+    """
+    GET a JSON document. Returns the cache entry {"url", "etag", "last_modified", "fetched", "body", "next"}.
+    A fresh entry (younger than `ttl`) is returned without a request; a stale one is revalidated with
+    If-None-Match / If-Modified-Since and reused on 304 Not Modified.
+    """
+    entry = cache.get(url) if cache else None
+    if entry and time.time() - entry["fetched"] < ttl:
+        return entry
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = await client().get(url, headers=headers)
+    if response.status_code == 304 and entry:
+        entry["fetched"] = time.time()
+    else:
+        response.raise_for_status()
+        body = response.json()
+        entry = {"url": url, "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"),
+                 "fetched": time.time(), "body": body, "next": next_link(response, body)}
+    if cache:
+        cache.put(url, entry)
+    return entry
+
+
+async def iter_pages(url, cache, ttl=DEFAULT_TTL, max_pages=None):
+    """Yields the cache entry of each page as it arrives, following next links; a link back to a page already seen ends it."""
+    pages, seen = 0, set()
+    while url and url not in seen and (max_pages is None or pages < max_pages):
+        seen.add(url)
+        entry = await get_json(url, cache, ttl)
+        yield entry
+        pages += 1
+        url = entry["next"]
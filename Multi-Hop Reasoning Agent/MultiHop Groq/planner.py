@@ -0,0 +1,65 @@
+import re
+from parallel_pipeline import ParallelReasoningPipeline
+
+# Words in parsed targets that say nothing about which data source is needed
+IGNORED_TERMS = set("a an and analyze analyse by data for from in of on or the to with".split())
+
+
+def terms(text):
+    """Lower-case words of a target or tag, with a plural "s" stripped so "competitors" matches "competitor"."""
+    return {t[:-1] if len(t) > 3 and t.endswith("s") and not t.endswith("ss") else t
+            for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in IGNORED_TERMS}
+
+
+class StepPlanner:
+    """Builds a pipeline with only the registered steps whose capability tags match the parsed query targets."""
+
+    def __init__(self, cache=None, max_age=None):
+        self.cache = cache
+        self.max_age = max_age
+        self.specs = []
+
+    def register(self, name, tags, description, data_type, color, source, processor, inputs=None):
+        """
+        Registers a candidate step. `source` and `processor` are zero-argument factories, only called when the step is
+        planned (`source` may be None for hops). A hop (a step with `inputs`) is planned with all its inputs when its own
+        tags match, and otherwise whenever at least two of its input steps are planned.
+        """
+        self.specs.append({"name": name, "tags": set().union(*(terms(tag) for tag in tags)), "description": description,
+                           "data_type": data_type, "color": color, "source": source, "processor": processor,
+                           "inputs": dict(inputs or {})})
+
+    def match(self, targets):
+        """{step name: matched terms} for the steps whose tags match any target."""
+        query_terms = set().union(*(terms(target) for target in targets)) if targets else set()
+        return {spec["name"]: sorted(query_terms & spec["tags"]) for spec in self.specs if query_terms & spec["tags"]}
+
+    def plan(self, targets):
+        """Names of the steps to run, in registration order. When no target matches any tag, every step is planned."""
+        matched = self.match(targets)
+        if not matched:
+            return [spec["name"] for spec in self.specs]
+        names = set(matched)
+        for spec in self.specs:
+            if spec["inputs"] and spec["name"] in matched:
+                names.update(spec["inputs"].values())
+        for spec in self.specs:
+            if spec["inputs"] and sum(source in names for source in spec["inputs"].values()) >= 2:
+                names.add(spec["name"])
+        return [spec["name"] for spec in self.specs if spec["name"] in names]
+
+    def build(self, targets):
+        """A pipeline with the planned steps; hops only receive the inputs of steps that were planned."""
+        names = self.plan(targets)
+        pipeline = ParallelReasoningPipeline(cache=self.cache, max_age=self.max_age)
+        for spec in self.specs:
+            if spec["name"] not in names:
+                continue
+            pipeline.add_step(
+                spec["description"],
+                spec["source"]() if spec["source"] else None,
+                spec["processor"](),
+                spec["data_type"], spec["color"], name=spec["name"],
+                inputs={key: source for key, source in spec["inputs"].items() if source in names}
+            )
+        return pipeline
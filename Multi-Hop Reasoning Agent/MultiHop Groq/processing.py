@@ -1,48 +1,88 @@
+from sales_features import SalesAggregator, format_features
+from retrieval import format_passages
+from chunking import count_tokens, map_reduce
+
+
+def analyze(groq_client, system_message, instruction, content, temperature=0):
+    """Chat completion for the instruction and content, map-reduced over chunks when the content overflows the model context."""
+    options = {} if temperature is None else {"temperature": temperature}
+
+    def generate(prompt):
+        response = groq_client.chat.completions.create(
+            model="llama3-70b-8192",
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            **options,
+        )
+        return response.choices[0].message.content
+
+    return map_reduce(instruction, content, generate, "llama3-70b-8192", overhead=count_tokens(system_message))
+
+
+def sales_features(data):
+    """Features precomputed by SalesFeatureSource, or aggregated here in one pass over full or chunked rows."""
+    if "sales_features" in data:
+        return data["sales_features"]
+    chunks = data["sql_chunks"] if "sql_chunks" in data else [data["sql_data"]]
+    aggregator = None
+    for chunk in chunks:
+        if chunk and aggregator is None:
+            aggregator = SalesAggregator(data.get("columns") or [f"column_{i}" for i in range(len(chunk[0]))])
+        if chunk:
+            aggregator.add(chunk)
+    return aggregator.features() if aggregator else {"rows": 0}
+
+
+# Passages retrieved per query when feedback comes from a document corpus
+FEEDBACK_TOP_K = 8
+DEFAULT_FEEDBACK_QUERY = "customer feedback complaints problems quality price"
+
+
+def feedback_context(data, query_terms=None, top_k=FEEDBACK_TOP_K):
+    """Full text of a single document, or the top-k corpus passages for the parsed query terms."""
+    if "corpus" not in data:
+        return data["document_text"]
+    query = " ".join(term.replace("Analyze ", "", 1) for term in query_terms or []) or DEFAULT_FEEDBACK_QUERY
+    return format_passages(data["corpus"].search(query, top_k))
+
+
 class SalesProcessor:
     """Processes sales data using LLM for real insights."""
     def __init__(self, groq_client):
         self.groq_client = groq_client
 
     def process(self, data):
-        if not data["sql_data"]:
+        features = sales_features(data)
+        if not features["rows"]:
             return "No sales data available."
 
-        # Format data for LLM analysis
-        sales_records = "\n".join([str(record) for record in data["sql_data"]])
+        # Send the computed features, not the raw rows, for LLM analysis
+        sales_summary = format_features(features)
 
-        # Prompt LLM to analyze sales trends
-        response = self.groq_client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[
-                {"role": "system", "content": "You are an expert business analyst."},
-                {"role": "user", "content": f"Analyze the following sales data and provide insights:\n\n{sales_records}"}
-            ],
-            temperature=0,
-        )
-        return response.choices[0].message.content
+        # Prompt LLM to analyze sales trends (in chunks if the statistics overflow the context)
+        return analyze(self.groq_client, "You are an expert business analyst.",
+                       "Analyze the following sales statistics (computed from the sales data) and provide insights:", sales_summary)
 
 
 class FeedbackProcessor:
     """Processes customer feedback using LLM for real insights."""
-    def __init__(self, groq_client):
+    def __init__(self, groq_client, query_terms=None, top_k=FEEDBACK_TOP_K):
         self.groq_client = groq_client
+        self.query_terms = query_terms
+        self.top_k = top_k
 
     def process(self, data):
-        feedback_text = data["document_text"]
+        # Whole document, or only the passages relevant to the query when a corpus was indexed
+        feedback_text = feedback_context(data, self.query_terms, self.top_k)
 
         if not feedback_text.strip():
             return "No feedback data available."
 
-        # Prompt LLM to analyze customer sentiment
-        response = self.groq_client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[
-                {"role": "system", "content": "You are an expert in customer sentiment analysis."},
-                {"role": "user", "content": f"Analyze the following customer feedback and provide insights:\n\n{feedback_text}"}
-            ],
-            temperature=0,
-        )
-        return response.choices[0].message.content
+        # Prompt LLM to analyze customer sentiment (in chunks if the feedback overflows the context)
+        return analyze(self.groq_client, "You are an expert in customer sentiment analysis.",
+                       "Analyze the following customer feedback and provide insights:", feedback_text)
 
 
 class CompetitorProcessor:
@@ -91,21 +131,53 @@ class MarketTrendsProcessor:
         return response.choices[0].message.content
 
 
-class SummarizationProcessor:
-    """Summarizes insights using LLM."""
+class CorrelationProcessor:
+    """Second-hop analysis: relates the insights of earlier steps to each other using LLM."""
     def __init__(self, groq_client):
         self.groq_client = groq_client
 
-    def process(self, insights):
-        """Generates final summary using LLM."""
-        combined_text = " ".join(insights)
-        
+    def process(self, data):
+        findings = "\n\n".join(f"{key.replace('_', ' ').title()}:\n{value}" for key, value in data.items() if isinstance(value, str) and value.strip())
+
+        if not findings:
+            return "No upstream insights available."
+
+        # Prompt LLM to connect findings across data sources
         response = self.groq_client.chat.completions.create(
             model="llama3-70b-8192",
             messages=[
-                {"role": "system", "content": "Create a concise, actionable summary of the following business insights."},
-                {"role": "user", "content": combined_text}
-            ]
+                {"role": "system", "content": "You are an expert business analyst who connects evidence across data sources."},
+                {"role": "user", "content": f"Using the following findings from separate analyses, identify which factors explain each other "
+                                            f"(e.g. feedback or competitor moves that explain sales changes) and rank the likely root causes:\n\n{findings}"}
+            ],
+            temperature=0,
         )
+        return response.choices[0].message.content
+
+
+def insight_texts(insights):
+    """Insight strings from a list, or from the step results returned by ParallelReasoningPipeline.run (failed steps dropped)."""
+    if isinstance(insights, dict):
+        return [result["insights"] for result in insights.values() if not result["error"]]
+    return list(insights)
+
+
+class SummarizationProcessor:
+    """Summarizes insights using LLM."""
+    def __init__(self, groq_client):
+        self.groq_client = groq_client
+
+    def process(self, insights):
+        """Generates final summary using LLM."""
+        combined_text = "\n\n".join(insight_texts(insights))
+
+        return analyze(self.groq_client, "Create a concise, actionable summary of the following business insights.", "", combined_text, temperature=None)
+
+    def fold(self, summary, updates):
+        """Folds new (step description, insights) pairs into the running summary; starts one if there is none yet."""
+        findings = "\n\n".join(f"{description}:\n{insights}" for description, insights in updates)
+        if summary is None:
+            return self.process([findings])
 
-        return response.choices[0].message.content
\ No newline at end of file
+        return analyze(self.groq_client, "Create a concise, actionable summary of the following business insights.",
+                       f"Current summary:\n{summary}\n\nUpdate it with these new findings, keeping it concise:", findings, temperature=None)
\ No newline at end of file
@@ -0,0 +1,323 @@
+import os
+import re
+import json
+import math
+import heapq
+import sqlite3
+import hashlib
+from data_sources import connection_pool, db_stat
+
+# Column names recognised as the sales measure and as the time axis, in order of preference
+MEASURE_NAMES = ("sales", "revenue", "amount", "units", "quantity", "total")
+TIME_NAMES = ("quarter", "period", "month", "week", "date", "year")
+# Distinct values listed per dimension and extreme rows kept for outlier detection
+MAX_DIMENSION_VALUES = 10
+EXTREME_ROWS = 5
+OUTLIER_Z = 2.0
+# Aggregator state saved per (database, table, filter), so later runs only aggregate rows added since
+SALES_STATE_DIR = os.path.join(".cache", "sales_state")
+
+
+def _is_id(name):
+    return name.lower() == "id" or name.lower().endswith("_id")
+
+
+def detect_columns(columns, sample_row=None, types=None):
+    """Picks (measure, time column, dimensions) from column names plus a sample row or declared SQL types."""
+    def numeric(i):
+        if types:
+            return any(t in (types[i] or "").upper() for t in ("INT", "REAL", "FLOA", "DOUB", "NUM", "DEC"))
+        return sample_row is not None and isinstance(sample_row[i], (int, float)) and not isinstance(sample_row[i], bool)
+
+    lowered = [c.lower() for c in columns]
+    measure = next((columns[lowered.index(n)] for n in MEASURE_NAMES if n in lowered and numeric(lowered.index(n))), None)
+    if measure is None:
+        candidates = [c for i, c in enumerate(columns) if numeric(i) and not _is_id(c)]
+        measure = candidates[-1] if candidates else None
+    time_column = next((c for n in TIME_NAMES for c in columns if n in c.lower()), None)
+    dimensions = [c for i, c in enumerate(columns) if c not in (measure, time_column) and not numeric(i) and not _is_id(c)]
+    return measure, time_column, dimensions
+
+
+class SalesAggregator:
+    """Single-pass, mergeable aggregation of sales rows into totals, breakdowns, a time series and extremes."""
+
+    def __init__(self, columns, measure=None, time_column=None, dimensions=None):
+        self.columns = list(columns)
+        self.measure = measure
+        self.time_column = time_column
+        self.dimensions = dimensions
+        self.state = {"count": 0, "sum": 0.0, "sumsq": 0.0, "min": None, "max": None,
+                      "dimensions": {}, "periods": {}, "highest": [], "lowest": []}
+
+    def _resolve(self, sample_row):
+        measure, time_column, dimensions = detect_columns(self.columns, sample_row)
+        self.measure = self.measure or measure
+        self.time_column = self.time_column or time_column
+        if self.dimensions is None:
+            self.dimensions = dimensions
+        if self.measure is None:
+            raise ValueError(f"No numeric sales column among: {', '.join(self.columns)}")
+
+    def add(self, rows):
+        """Folds a chunk of rows (tuples in column order) into the aggregate."""
+        for row in rows:
+            if self.measure is None:
+                self._resolve(row)
+            value = row[self.columns.index(self.measure)]
+            if value is None:
+                continue
+            self._add_value(float(value), row)
+
+    def _add_value(self, value, row):
+        s = self.state
+        s["count"] += 1
+        s["sum"] += value
+        s["sumsq"] += value * value
+        s["min"] = value if s["min"] is None else min(s["min"], value)
+        s["max"] = value if s["max"] is None else max(s["max"], value)
+        for dim in self.dimensions:
+            group = s["dimensions"].setdefault(dim, {}).setdefault(str(row[self.columns.index(dim)]), [0, 0.0])
+            group[0] += 1
+            group[1] += value
+        if self.time_column:
+            period = s["periods"].setdefault(str(row[self.columns.index(self.time_column)]), [0, 0.0])
+            period[0] += 1
+            period[1] += value
+        self._keep_extreme(value, row)
+
+    def _keep_extreme(self, value, row):
+        for key, sign in (("highest", 1), ("lowest", -1)):
+            heap = self.state[key]
+            entry = [sign * value, self.state["count"], list(row)]  # The row count breaks ties
+            if len(heap) < EXTREME_ROWS:
+                heapq.heappush(heap, entry)
+            elif entry[0] > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+
+    def load_sql(self, totals, groups, periods, highest, lowest):
+        """Loads aggregates computed in SQL: totals (count, sum, sumsq, min, max), {dim: [(value, count, sum)]},
+        [(period, count, sum)] and the highest/lowest rows."""
+        count, total, sumsq, low, high = totals
+        self.state.update({"count": count or 0, "sum": float(total or 0), "sumsq": float(sumsq or 0),
+                           "min": low, "max": high})
+        for dim, rows in groups.items():
+            self.state["dimensions"][dim] = {str(value): [n, float(s or 0)] for value, n, s in rows}
+        self.state["periods"] = {str(period): [n, float(s or 0)] for period, n, s in periods}
+        index = self.columns.index(self.measure)
+        self.state["highest"] = [[float(r[index]), i, list(r)] for i, r in enumerate(highest)]
+        self.state["lowest"] = [[-float(r[index]), i, list(r)] for i, r in enumerate(lowest)]
+        heapq.heapify(self.state["highest"])
+        heapq.heapify(self.state["lowest"])
+
+    def features(self):
+        """Compact feature summary: overall statistics, per-dimension shares, period deltas, trend slope and outliers."""
+        s = self.state
+        n = s["count"]
+        if not n:
+            return {"rows": 0, "measure": self.measure}
+        mean = s["sum"] / n
+        std = math.sqrt(max(0.0, s["sumsq"] / n - mean * mean))
+        features = {"rows": n, "measure": self.measure, "total": s["sum"], "mean": mean, "std": std,
+                    "min": s["min"], "max": s["max"], "breakdowns": {}, "filters": {}}
+
+        for dim, groups in s["dimensions"].items():
+            if len(groups) == 1:
+                features["filters"][dim] = next(iter(groups))  # Constant within the analysed rows
+                continue
+            ranked = sorted(groups.items(), key=lambda g: -g[1][1])
+            features["breakdowns"][dim] = [
+                {"value": value, "rows": count, "total": total, "share": total / s["sum"] if s["sum"] else 0.0}
+                for value, (count, total) in ranked[:MAX_DIMENSION_VALUES]
+            ]
+            rest = [totals for _, totals in ranked[MAX_DIMENSION_VALUES:]]
+            if rest:
+                rest_total = sum(total for _, total in rest)
+                features["breakdowns"][dim].append({"value": f"{len(rest)} others", "rows": sum(count for count, _ in rest),
+                                                    "total": rest_total, "share": rest_total / s["sum"] if s["sum"] else 0.0})
+
+        if s["periods"]:
+            series = sorted(s["periods"].items())
+            totals = [total for _, (_, total) in series]
+            features["periods"] = [
+                {"period": period, "total": total,
+                 "change": total - totals[i - 1] if i else None,
+                 "change_pct": (total - totals[i - 1]) / totals[i - 1] if i and totals[i - 1] else None}
+                for i, (period, (_, total)) in enumerate(series)
+            ]
+            if len(totals) > 1:
+                x_mean = (len(totals) - 1) / 2
+                y_mean = sum(totals) / len(totals)
+                slope = sum((i - x_mean) * (y - y_mean) for i, y in enumerate(totals)) / sum((i - x_mean) ** 2 for i in range(len(totals)))
+                features["trend"] = {"slope_per_period": slope, "slope_pct_of_mean": slope / y_mean if y_mean else None}
+
+        index = self.columns.index(self.measure)
+        extremes = [entry[2] for entry in s["highest"] + s["lowest"]]
+        outliers, seen = [], set()
+        for row in extremes:
+            z = (float(row[index]) - mean) / std if std else 0.0
+            if abs(z) >= OUTLIER_Z and tuple(row) not in seen:
+                seen.add(tuple(row))
+                outliers.append({"row": dict(zip(self.columns, row)), "z": z})
+        features["outliers"] = sorted(outliers, key=lambda o: -abs(o["z"]))
+        return features
+
+
+def format_features(features):
+    """Renders the feature summary as a few lines of text for the LLM prompt."""
+    if not features["rows"]:
+        return "No sales data available."
+    m = features["measure"]
+    lines = [f"Rows analysed: {features['rows']}"]
+    if features["filters"]:
+        lines.append("Scope: " + ", ".join(f"{k} = {v}" for k, v in features["filters"].items()))
+    lines.append(f"{m}: total {features['total']:.2f}, mean {features['mean']:.2f}, std {features['std']:.2f}, "
+                 f"min {features['min']:.2f}, max {features['max']:.2f}")
+    for dim, groups in features["breakdowns"].items():
+        lines.append(f"{m} by {dim}: " + "; ".join(f"{g['value']} {g['total']:.2f} ({g['share']:.1%}, {g['rows']} rows)" for g in groups))
+    for p in features.get("periods", []):
+        change = "" if p["change"] is None else f", change {p['change']:+.2f}"
+        change += "" if p["change_pct"] is None else f" ({p['change_pct']:+.1%})"
+        lines.append(f"Period {p['period']}: {m} {p['total']:.2f}{change}")
+    if "trend" in features:
+        t = features["trend"]
+        pct = "" if t["slope_pct_of_mean"] is None else f" ({t['slope_pct_of_mean']:+.1%} of the period mean)"
+        lines.append(f"Trend slope: {t['slope_per_period']:+.2f} per period{pct}")
+    if features["outliers"]:
+        lines.append("Outliers: " + "; ".join(f"{o['row']} (z={o['z']:+.1f})" for o in features["outliers"]))
+    else:
+        lines.append(f"Outliers: none beyond {OUTLIER_Z:.0f} standard deviations")
+    return "\n".join(lines)
+
+
+class SalesFeatureSource:
+    """
+    Computes sales features inside SQLite (GROUP BY pushdown), so only aggregates leave the database.
+    The aggregate state is saved with the highest rowid it covers; later runs fold in only newer rows. Rows are
+    assumed to be appended: if the count or sum of already-covered rows changed, everything is recomputed.
+    """
+
+    def __init__(self, db_path, table, where="", params=(), measure=None, time_column=None, dimensions=None, read_only=True,
+                 state_dir=SALES_STATE_DIR):
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", table):
+            raise ValueError(f"Invalid table name: {table}")
+        self.db_path = db_path
+        self.table = table
+        self.where = where
+        self.params = params
+        self.measure = measure
+        self.time_column = time_column
+        self.dimensions = dimensions
+        self.read_only = read_only
+        self.state_dir = state_dir
+        self.last = None  # (db_stat, features) of the latest aggregation
+
+    def fetch_data(self):
+        return {"sales_features": self.features()}
+
+    def fingerprint(self):
+        """Hash of the current features: unchanged as long as the analysed rows aggregate to the same figures."""
+        return hashlib.sha256(json.dumps(self.features(), sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def features(self):
+        stat = db_stat(self.db_path)
+        if self.last is None or self.last[0] != stat:
+            self.last = (stat, self.aggregate(stat).features())
+        return self.last[1]
+
+    def state_path(self):
+        key = json.dumps([os.path.abspath(self.db_path), self.table, self.where, list(self.params),
+                          self.measure, self.time_column, self.dimensions], default=str)
+        return os.path.join(self.state_dir, hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + ".json")
+
+    def aggregate(self, stat):
+        """Aggregator over the current rows: saved state plus rows added since, or a full pushdown when there is none."""
+        conn = connection_pool.get(self.db_path, self.read_only)
+        info = conn.execute(f'PRAGMA table_info("{self.table}")').fetchall()
+        columns, types = [row[1] for row in info], [row[2] for row in info]
+        measure, time_column, dimensions = detect_columns(columns, types=types)
+        aggregator = SalesAggregator(columns, self.measure or measure, self.time_column or time_column,
+                                     dimensions if self.dimensions is None else self.dimensions)
+        if aggregator.measure is None:
+            raise ValueError(f"No numeric sales column in table {self.table}")
+
+        try:
+            max_rowid = conn.execute(f'SELECT MAX(rowid) FROM "{self.table}"').fetchone()[0] or 0
+        except sqlite3.OperationalError:  # WITHOUT ROWID table: always aggregate in full
+            self._pushdown(conn, aggregator)
+            return aggregator
+        saved = self._load_state(columns)
+        if saved and saved["db_stat"] == stat:
+            aggregator.state = saved["state"]
+        elif saved and saved["max_rowid"] <= max_rowid and self._unchanged(conn, aggregator, saved):
+            aggregator.state = saved["state"]
+            self._append(conn, aggregator, saved["max_rowid"], max_rowid)
+        else:
+            self._pushdown(conn, aggregator, max_rowid)
+        self._save_state(columns, stat, max_rowid, aggregator)
+        return aggregator
+
+    def _scope(self, low=None, high=None):
+        """FROM/WHERE clause and parameters for the filtered rows, optionally limited to low < rowid <= high."""
+        conditions, params = ([f"({self.where})"] if self.where else []), list(self.params)
+        if low is not None:
+            conditions.append("rowid > ?")
+            params.append(low)
+        if high is not None:
+            conditions.append("rowid <= ?")
+            params.append(high)
+        return f'FROM "{self.table}"' + (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def _pushdown(self, conn, aggregator, max_rowid=None):
+        q = lambda name: '"' + name.replace('"', '""') + '"'
+        m = q(aggregator.measure)
+        base, params = self._scope(high=max_rowid)
+        totals = conn.execute(f"SELECT COUNT({m}), SUM({m}), SUM({m} * {m}), MIN({m}), MAX({m}) {base}", params).fetchone()
+        groups = {dim: conn.execute(f"SELECT {q(dim)}, COUNT({m}), SUM({m}) {base} GROUP BY {q(dim)}", params).fetchall()
+                  for dim in aggregator.dimensions}
+        periods = []
+        if aggregator.time_column:
+            t = q(aggregator.time_column)
+            periods = conn.execute(f"SELECT {t}, COUNT({m}), SUM({m}) {base} GROUP BY {t}", params).fetchall()
+        not_null = (" AND " if " WHERE " in base else " WHERE ") + f"{m} IS NOT NULL"
+        highest = conn.execute(f"SELECT * {base}{not_null} ORDER BY {m} DESC LIMIT {EXTREME_ROWS}", params).fetchall()
+        lowest = conn.execute(f"SELECT * {base}{not_null} ORDER BY {m} ASC LIMIT {EXTREME_ROWS}", params).fetchall()
+        aggregator.load_sql(totals, groups, periods, highest, lowest)
+
+    def _unchanged(self, conn, aggregator, saved):
+        """Whether the rows covered by the saved state still have the same count and sum (no deletes or edits)."""
+        m = '"' + aggregator.measure.replace('"', '""') + '"'
+        base, params = self._scope(high=saved["max_rowid"])
+        count, total = conn.execute(f"SELECT COUNT({m}), SUM({m}) {base}", params).fetchone()
+        return count == saved["state"]["count"] and math.isclose(float(total or 0), saved["state"]["sum"], rel_tol=1e-9, abs_tol=1e-6)
+
+    def _append(self, conn, aggregator, low, high):
+        base, params = self._scope(low, high)
+        cursor = conn.execute(f"SELECT * {base} ORDER BY rowid", params)
+        try:
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                aggregator.add(rows)
+        finally:
+            cursor.close()
+
+    def _load_state(self, columns):
+        if not self.state_dir or not os.path.exists(self.state_path()):
+            return None
+        try:
+            with open(self.state_path(), "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except ValueError:
+            return None
+        return saved if saved.get("columns") == columns else None
+
+    def _save_state(self, columns, stat, max_rowid, aggregator):
+        if not self.state_dir:
+            return
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = f"{self.state_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"columns": columns, "db_stat": stat, "max_rowid": max_rowid, "state": aggregator.state}, f, default=str)
+        os.replace(tmp_path, self.state_path())
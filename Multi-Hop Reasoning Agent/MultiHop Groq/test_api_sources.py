@@ -0,0 +1,88 @@
+import json
+import asyncio
+import threading
+import httpx
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from stub_server import FIXTURES, start_stub_server, update_fixture
+from data_sources import APIDataSource
+from http_client import ResponseCache, iter_pages, run_sync
+
+
+@pytest.fixture
+def stub():
+    server, base_url = start_stub_server(page_size=2)
+    yield server, base_url
+    server.shutdown()
+
+
+def source(base_url, tmp_path, name="competitors", ttl=0):
+    return APIDataSource(f"{base_url}/{name}", ttl=ttl, cache_dir=str(tmp_path / "http"))
+
+
+def test_follows_next_links_across_pages(stub, tmp_path):
+    server, base_url = stub
+    data = source(base_url, tmp_path).fetch_data()
+    assert data["competitors"].count("competitor: ") == len(FIXTURES["competitors"])
+    assert server.requests == ["/competitors", "/competitors?page=2", "/competitors?page=3"]
+
+
+def test_second_fetch_revalidates_with_304(stub, tmp_path):
+    server, base_url = stub
+    first = source(base_url, tmp_path).fetch_data()
+    second = source(base_url, tmp_path).fetch_data()
+    assert second == first
+    assert server.not_modified == 3  # Every page of the second fetch
+    assert len(server.requests) == 6
+
+
+def test_fresh_cache_skips_requests(stub, tmp_path):
+    server, base_url = stub
+    source(base_url, tmp_path, ttl=300).fetch_data()
+    source(base_url, tmp_path, ttl=300).fetch_data()
+    assert len(server.requests) == 3
+
+
+def test_picks_up_fixture_updates(stub, tmp_path):
+    server, base_url = stub
+    before = source(base_url, tmp_path)
+    fingerprint = before.fingerprint()
+    update_fixture(server, "competitors", [{"competitor": "Brand D", "region": "Region B", "offer": "New entrant", "price_change": "-12%"}])
+    after = source(base_url, tmp_path)
+    assert after.fingerprint() != fingerprint
+    assert after.fetch_data() == {"competitors": "competitor: Brand D; region: Region B; offer: New entrant; price_change: -12%"}
+
+
+def test_missing_endpoint_raises_http_status_error(stub, tmp_path):
+    _, base_url = stub
+    with pytest.raises(httpx.HTTPStatusError):
+        source(base_url, tmp_path, name="missing").fetch_data()
+
+
+class CyclicHandler(BaseHTTPRequestHandler):
+    """Two pages whose next links point at each other."""
+
+    def do_GET(self):
+        body = json.dumps({"items": [{"page": self.path}], "next": "/b" if self.path == "/a" else "/a"}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_next_link_cycle_ends(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CyclicHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        async def pages():
+            return [entry["url"] async for entry in iter_pages(f"http://127.0.0.1:{server.server_address[1]}/a",
+                                                               ResponseCache(str(tmp_path / "http")))]
+
+        urls = run_sync(asyncio.wait_for(pages(), timeout=10))
+    finally:
+        server.shutdown()
+    assert [url.rsplit("/", 1)[-1] for url in urls] == ["a", "b"]
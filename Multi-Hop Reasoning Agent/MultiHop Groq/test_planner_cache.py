@@ -0,0 +1,60 @@
+import os
+from insight_cache import InsightCache
+from planner import StepPlanner
+
+
+class StaticSource:
+    def __init__(self, key):
+        self.key = key
+
+    def fetch_data(self):
+        return {self.key: f"{self.key} data"}
+
+    def fingerprint(self):
+        return self.key
+
+
+class RecordingProcessor:
+    """Answers with what it was given, and records its name in `calls` on every call."""
+    def __init__(self, name, calls, query_terms=None):
+        self.name = name
+        self.record = calls.append  # A callable, so it stays out of the processor fingerprint
+        self.query_terms = query_terms
+
+    def process(self, data):
+        self.record(self.name)
+        return f"{self.name}({', '.join(sorted(data))}; {' '.join(self.query_terms or [])})"
+
+
+def build(cache_path, calls, tasks):
+    planner = StepPlanner(cache=InsightCache(cache_path), max_age=15 * 60)
+    for name in ("sales", "feedback", "competitors"):
+        planner.register(name, [name], f"Analyze {name}", name, "blue",
+                         lambda name=name: StaticSource(name),
+                         lambda name=name: RecordingProcessor(name, calls, query_terms=tasks if name == "feedback" else None))
+    planner.register("correlation", ["factors"], "Correlate", "Previous Steps", "magenta", None,
+                     lambda: RecordingProcessor("correlation", calls),
+                     inputs={"sales_insights": "sales", "feedback_insights": "feedback", "competitor_insights": "competitors"})
+    return planner.build(tasks)
+
+
+def test_max_age_shortcut_respects_plan(tmp_path):
+    cache_path = os.path.join(str(tmp_path), "insights.db")
+    calls = []
+
+    first = build(cache_path, calls, ["Analyze sales", "Analyze feedback"]).run()
+    assert sorted(calls) == ["correlation", "feedback", "sales"]
+    assert first["correlation"]["insights"] == "correlation(feedback_insights, sales_insights; )"
+
+    # Within max_age, but the hop is planned over other inputs and feedback is retrieved for other terms
+    calls.clear()
+    second = build(cache_path, calls, ["Analyze competitors", "Analyze feedback"]).run()
+    assert sorted(calls) == ["competitors", "correlation", "feedback"]
+    assert second["correlation"]["insights"] == "correlation(competitor_insights, feedback_insights; )"
+    assert second["feedback"]["insights"].endswith("; Analyze competitors Analyze feedback)")
+
+    # The same query again is served from the cache without any call
+    calls.clear()
+    third = build(cache_path, calls, ["Analyze competitors", "Analyze feedback"]).run()
+    assert calls == []
+    assert all(result["cached"] for result in third.values())
@@ -1,14 +1,26 @@
+import asyncio
 from config import Config
 from query_parser import QueryParser
-from parallel_pipeline import ParallelReasoningPipeline
-from data_sources import SQLDataSource, DocumentParser, APIDataSource
-from processing import SalesProcessor, FeedbackProcessor, CompetitorProcessor, MarketTrendsProcessor
+from planner import StepPlanner
+from insight_cache import InsightCache
+from data_sources import DocumentParser, APIDataSource
+from sales_features import SalesFeatureSource
+from processing import SalesProcessor, FeedbackProcessor, CompetitorProcessor, MarketTrendsProcessor, CorrelationProcessor, close_backends
 from summarization import SummarizationProcessor
+from http_client import close_clients
 from rich.console import Console
 from rich.panel import Panel
 
 console = Console()
 
+async def run_async(pipeline, summarizer):
+    """Runs the pipeline on the event loop and closes the shared Ollama and API clients before the loop ends."""
+    try:
+        return await pipeline.arun(summarizer=summarizer)
+    finally:
+        await close_backends()
+        await close_clients()
+
 def main():
     console.print("[bold cyan]\nEnhanced Multi-Hop Reasoning Agent[/bold cyan]\n")
 
@@ -21,41 +33,57 @@ def main():
     tasks = query_parser.parse(query)
     console.print(Panel(f"Parsed Tasks: {tasks}", title="Query Parsing", border_style="cyan"))
 
-    # Initialize the pipeline
-    pipeline = ParallelReasoningPipeline()
-
-    # Add reasoning steps
-    pipeline.add_step(
-        "Retrieve and analyze sales data for Product X",
-        SQLDataSource("sales.db", "SELECT * FROM sales WHERE product='Product X'"),
-        SalesProcessor(config),
-        "SQL Database", "blue"
+    # Register every step the agent can run, tagged with what it can answer; the planner keeps only the steps the
+    # parsed targets ask for, and steps analyzed within the last 15 minutes reuse their stored insight
+    planner = StepPlanner(cache=InsightCache(), max_age=15 * 60)
+    api_url = lambda path: f"{config.api_base_url}/{path}" if config.api_base_url else f"mock://{path}"
+    planner.register(
+        "sales", ("sales", "revenue", "units sold", "decline", "drop", "performance", "quarter", "region", "channel"),
+        "Retrieve and analyze sales data for Product X", "SQL Database", "blue",
+        lambda: SalesFeatureSource("sales.db", "sales", "product = ?", ("Product X",)),
+        lambda: SalesProcessor(config)
     )
-    pipeline.add_step(
-        "Retrieve and analyze customer feedback for Product X",
-        DocumentParser("feedback.pdf"),
-        FeedbackProcessor(config),
-        "Document", "green"
+    planner.register(
+        "feedback", ("customer feedback", "sentiment", "reviews", "complaints", "satisfaction", "quality", "durability"),
+        "Retrieve and analyze customer feedback for Product X", "Document", "green",
+        lambda: DocumentParser("feedback.pdf"),
+        lambda: FeedbackProcessor(config, query_terms=tasks)
     )
-    pipeline.add_step(
-        "Retrieve and analyze competitor data",
-        APIDataSource("mock://competitors"),
-        CompetitorProcessor(config),
-        "API", "yellow"
+    planner.register(
+        "competitors", ("competitor", "competition", "rival", "pricing", "price", "market share"),
+        "Retrieve and analyze competitor data", "API", "yellow",
+        lambda: APIDataSource(api_url("competitors")),
+        lambda: CompetitorProcessor(config)
     )
-    pipeline.add_step(
-        "Retrieve and analyze market trends",
-        APIDataSource("mock://market-trends"),
-        MarketTrendsProcessor(config),
-        "API", "red"
+    planner.register(
+        "market_trends", ("market trends", "demand", "industry", "consumer preferences", "sustainability", "seasonality"),
+        "Retrieve and analyze market trends", "API", "red",
+        lambda: APIDataSource(api_url("market-trends")),
+        lambda: MarketTrendsProcessor(config)
     )
+    # Second hop: runs as soon as the planned analyses above have produced their insights
+    planner.register(
+        "correlation", ("factors", "drivers", "driving", "causes", "reasons", "why", "explain", "impact"),
+        "Correlate sales, feedback, competitor and market findings", "Previous Steps", "magenta",
+        None,
+        lambda: CorrelationProcessor(config),
+        inputs={"sales": "sales", "feedback": "feedback", "competitors": "competitors", "market_trends": "market_trends"}
+    )
+    pipeline = planner.build(tasks)
+    console.print(Panel(f"Planned Steps: {[step['name'] for step in pipeline.steps]}", title="Step Planning", border_style="cyan"))
 
-    # Run the pipeline
-    insights = pipeline.run()
-
-    # Summarize results using Ollama
+    # Run the pipeline, folding each insight into the summary using Ollama as soon as its step completes
     summarizer = SummarizationProcessor(config)
-    final_summary = summarizer.process(insights)
+    if config.use_async:
+        results = asyncio.run(run_async(pipeline, summarizer))
+    else:
+        results = pipeline.run(summarizer=summarizer)
+    pipeline.print_trace()
+    for name, result in results.items():
+        if result["error"]:
+            console.print(f"[bold red]{name}:[/bold red] {result['error']}")
+
+    final_summary = pipeline.summary or "No insights were produced."
 
     console.print(Panel(final_summary, title="[bold]Final Summary[/bold]", border_style="magenta"))
 
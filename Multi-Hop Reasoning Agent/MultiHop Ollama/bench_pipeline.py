@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import platform
+from rich.console import Console
+from rich.table import Table
+from parallel_pipeline import ParallelReasoningPipeline
+
+console = Console()
+
+DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+def make_sampler(distribution, mean_ms, seed):
+    """Returns a function drawing latencies in seconds with the given distribution and mean."""
+    rng = random.Random(repr(seed))  # Any seed tuple, e.g. (run, step, role), gives a reproducible stream
+    mean = mean_ms / 1000
+    if distribution == "fixed":
+        return lambda: mean
+    if distribution == "uniform":
+        return lambda: rng.uniform(0, 2 * mean)
+    if distribution == "exponential":
+        return lambda: rng.expovariate(1 / mean) if mean else 0.0
+    if distribution == "lognormal":
+        sigma = 0.75  # Long right tail, like LLM response times
+        return lambda: rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma) if mean else 0.0
+    raise ValueError(f"Unknown distribution: {distribution}")
+
+
+def burn_cpu(ms):
+    """Keeps the CPU busy (holding the GIL) for about `ms` milliseconds, like parsing or feature extraction."""
+    deadline = time.perf_counter() + ms / 1000
+    block = b"x" * 1024
+    while time.perf_counter() < deadline:
+        block = hashlib.sha256(block).digest() * 32
+
+
+class SyntheticSource:
+    """Data source that waits for an injected latency and spends a fixed CPU cost."""
+
+    def __init__(self, name, sampler, cpu_ms):
+        self.name = name
+        self.sampler = sampler
+        self.cpu_ms = cpu_ms
+
+    def fetch_data(self):
+        time.sleep(self.sampler())
+        burn_cpu(self.cpu_ms)
+        return {self.name: f"{self.name} data"}
+
+    async def afetch_data(self):
+        await asyncio.sleep(self.sampler())
+        burn_cpu(self.cpu_ms)
+        return {self.name: f"{self.name} data"}
+
+
+class SyntheticProcessor:
+    """Processor standing in for an LLM call: injected latency plus a fixed CPU cost."""
+
+    def __init__(self, sampler, cpu_ms):
+        self.sampler = sampler
+        self.cpu_ms = cpu_ms
+
+    def process(self, data):
+        time.sleep(self.sampler())
+        burn_cpu(self.cpu_ms)
+        return f"insight from {', '.join(sorted(data))}"
+
+    async def aprocess(self, data):
+        await asyncio.sleep(self.sampler())
+        burn_cpu(self.cpu_ms)
+        return f"insight from {', '.join(sorted(data))}"
+
+
+def build_pipeline(args, steps, workers, seed):
+    """`steps` synthetic steps; with --shape fanin the last one is a hop over all the others (like the correlation step)."""
+    pipeline = ParallelReasoningPipeline(max_workers=workers)
+    leaves = steps - 1 if args.shape == "fanin" and steps > 1 else steps
+    for i in range(leaves):
+        pipeline.add_step(f"Synthetic step {i}", SyntheticSource(f"source_{i}", make_sampler(args.distribution, args.source_ms, (seed, i, 0)), args.cpu_ms),
+                          SyntheticProcessor(make_sampler(args.distribution, args.llm_ms, (seed, i, 1)), args.cpu_ms),
+                          "Synthetic", "blue", name=f"step_{i}")
+    if leaves < steps:
+        pipeline.add_step("Synthetic hop", None, SyntheticProcessor(make_sampler(args.distribution, args.llm_ms, (seed, "hop")), args.cpu_ms),
+                          "Previous Steps", "magenta", name="hop", inputs={f"step_{i}": f"step_{i}" for i in range(leaves)})
+    return pipeline
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def measure(args, runner, steps, workers):
+    """Runs one configuration `--runs` times (after one warm-up) and returns its latency and CPU statistics."""
+    latencies, cpu = [], []
+    for run in range(args.runs + 1):
+        pipeline = build_pipeline(args, steps, workers, seed=(args.seed, run))
+        wall, process = time.perf_counter(), time.process_time()
+        results = asyncio.run(pipeline.arun()) if runner == "async" else pipeline.run()
+        wall, process = time.perf_counter() - wall, time.process_time() - process
+        errors = [result["error"] for result in results.values() if result["error"]]
+        if errors:
+            raise RuntimeError(errors[0])
+        if run:  # The first run warms up imports, thread pools and the event loop
+            latencies.append(wall)
+            cpu.append(process)
+    return {
+        "runner": runner, "steps": steps, "workers": workers, "runs": args.runs,
+        "latency_ms": {"mean": 1000 * sum(latencies) / len(latencies), "p50": 1000 * percentile(latencies, 50),
+                       "p95": 1000 * percentile(latencies, 95), "min": 1000 * min(latencies), "max": 1000 * max(latencies)},
+        "throughput_steps_per_s": steps * len(latencies) / sum(latencies),
+        "cpu_ms_per_run": 1000 * sum(cpu) / len(cpu),
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    """Configurations whose p95 latency regressed by more than `tolerance` against a previous artifact."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["runner"], r["steps"], r["workers"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        before = baseline.get((result["runner"], result["steps"], result["workers"]))
+        if before and result["latency_ms"]["p95"] > before["latency_ms"]["p95"] * (1 + tolerance):
+            regressions.append((result, before))
+    return regressions
+
+
+def worker_label(workers):
+    return "default" if workers is None else str(workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ParallelReasoningPipeline with synthetic, latency-injected steps.")
+    parser.add_argument("--steps", type=int, nargs="+", default=[4, 16, 64], help="Step counts to sweep.")
+    parser.add_argument("--workers", nargs="+", default=["1", "4", "16", "default"],
+                        help="Executor sizes (max_workers) to sweep; 1 is the serial baseline, 'default' the executor default.")
+    parser.add_argument("--runners", nargs="+", choices=("sync", "async"), default=["sync", "async"])
+    parser.add_argument("--shape", choices=("flat", "fanin"), default="fanin", help="Independent steps, or independent steps plus one hop over all of them.")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="lognormal", help="Latency distribution of sources and processors.")
+    parser.add_argument("--source-ms", type=float, default=20, help="Mean data source latency.")
+    parser.add_argument("--llm-ms", type=float, default=100, help="Mean processor (LLM) latency.")
+    parser.add_argument("--cpu-ms", type=float, default=2, help="CPU time spent by each source and processor call.")
+    parser.add_argument("--runs", type=int, default=5, help="Measured runs per configuration.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_pipeline.json", help="Where to write the JSON results.")
+    parser.add_argument("--baseline", help="Previous results to compare against; exits with status 1 on a p95 regression.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 slowdown against the baseline (0.2 = 20%%).")
+    args = parser.parse_args()
+    workers = [None if w == "default" else int(w) for w in args.workers]
+
+    results = []
+    for steps in args.steps:
+        serial = None
+        for runner in args.runners:
+            for w in workers:
+                console.print(f"[dim]{runner} runner, {steps} steps, max_workers={worker_label(w)}...[/dim]")
+                result = measure(args, runner, steps, w)
+                if runner == "sync" and w == 1:
+                    serial = result
+                results.append(result)
+        if serial is None:  # Speedups are always relative to serial execution on the thread runner
+            serial = measure(args, "sync", steps, 1)
+        for result in results:
+            if result["steps"] == steps:
+                result["speedup_vs_serial"] = serial["latency_ms"]["mean"] / result["latency_ms"]["mean"]
+
+    table = Table(title=f"Pipeline benchmark ({args.shape}, {args.distribution} latency)", show_header=True, header_style="bold magenta")
+    for column, justify in (("Runner", "left"), ("Steps", "right"), ("Workers", "right"), ("p50", "right"), ("p95", "right"),
+                            ("Steps/s", "right"), ("CPU/run", "right"), ("Speedup", "right")):
+        table.add_column(column, justify=justify, style="cyan" if column == "Runner" else None)
+    for r in results:
+        table.add_row(r["runner"], str(r["steps"]), worker_label(r["workers"]), f"{r['latency_ms']['p50']:.0f} ms", f"{r['latency_ms']['p95']:.0f} ms",
+                      f"{r['throughput_steps_per_s']:.1f}", f"{r['cpu_ms_per_run']:.0f} ms", f"{r['speedup_vs_serial']:.1f}x")
+    console.print(table)
+
+    artifact = {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(), "platform": platform.platform(),
+                 "cpu_count": os.cpu_count(), "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")}},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, indent=2)
+    console.print(f"[bold]Results written to[/bold] {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for result, before in regressions:
+            console.print(f"[red]Regression: {result['runner']} runner, {result['steps']} steps, max_workers={worker_label(result['workers'])}: "
+                          f"p95 {before['latency_ms']['p95']:.0f} ms -> {result['latency_ms']['p95']:.0f} ms[/red]")
+        sys.exit(1 if regressions else 0)
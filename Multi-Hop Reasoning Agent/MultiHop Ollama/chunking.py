@@ -0,0 +1,134 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# Context window, tokens kept free for the response, and preferred chunk size per model. Oversized inputs are split into
+# chunks well below the window so the parts are analyzed concurrently; tinyllama's small window leaves little choice.
+MODEL_LIMITS = {
+    "llama3-70b-8192": {"context": 8192, "response": 1024, "chunk": 3072},
+    "tinyllama": {"context": 2048, "response": 512, "chunk": 1024},
+}
+DEFAULT_LIMITS = {"context": 4096, "response": 512, "chunk": 2048}
+# Token counts are estimates (a cl100k encoding, or 4 characters per token), so budgets keep a margin
+SAFETY_MARGIN = 0.85
+# Chunk analyses run at once per input
+MAP_WORKERS = 4
+COMBINE_INSTRUCTION = ("The following are partial analyses of consecutive parts of the same input. "
+                       "Combine them into one coherent analysis, keeping every distinct finding and figure.")
+
+_encoding = {}
+
+
+def _encoder():
+    if "encoder" not in _encoding:
+        try:
+            import tiktoken  # Optional; without it tokens are estimated from the length
+            _encoding["encoder"] = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding["encoder"] = None
+    return _encoding["encoder"]
+
+
+def count_tokens(text):
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def limits(model):
+    return MODEL_LIMITS.get(model, DEFAULT_LIMITS)
+
+
+def prompt_budget(model, overhead=0):
+    """Tokens of content that fit in one prompt next to `overhead` tokens of instructions."""
+    model_limits = limits(model)
+    return max(1, int((model_limits["context"] - model_limits["response"] - overhead) * SAFETY_MARGIN))
+
+
+def fits(instruction, content, model, overhead=0):
+    """Whether "instruction + content" can be sent to the model in a single call."""
+    return count_tokens(content) <= prompt_budget(model, overhead + count_tokens(instruction))
+
+
+def split_text(text, max_tokens, separators=("\n\n", "\n", " ")):
+    """Splits text into chunks of at most `max_tokens`, preferring paragraph, then line, then word boundaries."""
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    if not separators:
+        size = max(1, len(text) * max_tokens // count_tokens(text))
+        return [text[i:i + size] for i in range(0, len(text), size)]
+    separator, finer = separators[0], separators[1:]
+    chunks, current, current_tokens = [], [], 0
+    for piece in text.split(separator):
+        piece_tokens = count_tokens(piece)
+        for part, part_tokens in ([(piece, piece_tokens)] if piece_tokens <= max_tokens else
+                                  [(p, count_tokens(p)) for p in split_text(piece, max_tokens, finer)]):
+            if current and current_tokens + part_tokens + 1 > max_tokens:
+                chunks.append(separator.join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens + 1
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+def join_prompt(instruction, content):
+    return f"{instruction}\n\n{content}" if instruction else content
+
+
+def combine_prompt(instruction, partials):
+    parts = "\n\n".join(f"Part {i + 1}:\n{partial}" for i, partial in enumerate(partials))
+    return join_prompt(COMBINE_INSTRUCTION + (f" Original task: {instruction}" if instruction else ""), parts)
+
+
+def _groups(partials, budget):
+    """Consecutive partials packed into groups that fit the budget; at least two per group so every round shrinks."""
+    groups, current, used = [], [], 0
+    for partial in partials:
+        tokens = count_tokens(partial)
+        if current and used + tokens > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(partial)
+        used += tokens
+    groups.append(current)
+    if len(groups) == len(partials):
+        groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+    return groups
+
+
+def map_reduce(instruction, content, generate, model, overhead=0, max_workers=MAP_WORKERS):
+    """
+    Runs `generate(prompt)` on "instruction + content" in one call when it fits the model's context. Otherwise the
+    content is split into chunks analyzed concurrently, and the partial analyses are combined in rounds until one is left.
+    """
+    if fits(instruction, content, model, overhead):
+        return generate(join_prompt(instruction, content))
+    overhead += count_tokens(instruction)
+    chunks = split_text(content, min(limits(model)["chunk"], prompt_budget(model, overhead)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        partials = list(executor.map(lambda chunk: generate(join_prompt(instruction, chunk)), chunks))
+        budget = prompt_budget(model, overhead + count_tokens(COMBINE_INSTRUCTION))
+        while len(partials) > 1:
+            partials = list(executor.map(lambda group: generate(combine_prompt(instruction, group)), _groups(partials, budget)))
+    return partials[0]
+
+
+async def amap_reduce(instruction, content, agenerate, model, overhead=0, max_workers=MAP_WORKERS):
+    """Async counterpart of map_reduce() for a coroutine `agenerate(prompt)`."""
+    if fits(instruction, content, model, overhead):
+        return await agenerate(join_prompt(instruction, content))
+    overhead += count_tokens(instruction)
+    chunks = split_text(content, min(limits(model)["chunk"], prompt_budget(model, overhead)))
+    limit = asyncio.Semaphore(max_workers)
+
+    async def bounded(prompt):
+        async with limit:
+            return await agenerate(prompt)
+
+    partials = await asyncio.gather(*(bounded(join_prompt(instruction, chunk)) for chunk in chunks))
+    budget = prompt_budget(model, overhead + count_tokens(COMBINE_INSTRUCTION))
+    while len(partials) > 1:
+        partials = await asyncio.gather(*(bounded(combine_prompt(instruction, group)) for group in _groups(partials, budget)))
+    return partials[0]
@@ -7,6 +7,13 @@ class Config:
     def __init__(self):
         load_dotenv()
         self.api_url = "http://localhost:11434/api/generate"
+        # Concurrent requests per Ollama server and read timeout (seconds) for each call
+        self.max_concurrency = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "4"))
+        self.timeout = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+        # Run the pipeline on the asyncio runner (streaming, shared client) instead of one thread per step
+        self.use_async = os.getenv("OLLAMA_ASYNC", "1") == "1"
+        # Base URL of the competitor / market-trend API (e.g. http://127.0.0.1:8765 for stub_server.py); unset uses mock data
+        self.api_base_url = os.getenv("API_BASE_URL")
 
     def get_api_url(self):
         return self.api_url
\ No newline at end of file
@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import sqlite3
+import inspect
+import hashlib
+import threading
+from contextlib import contextmanager
+
+INSIGHT_CACHE_PATH = os.path.join(".cache", "insights.db")
+SUMMARY_KEY = "__summary__"
+
+
+def digest(*parts):
+    """Stable SHA-256 of JSON-serialisable parts."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def processor_fingerprint(processor):
+    """
+    Source of the processor's classes (prompts and model names live there) plus its plain settings.
+    Clients, callbacks and other objects are ignored.
+    """
+    sources = []
+    for cls in type(processor).__mro__:
+        if cls is object:
+            continue
+        try:
+            sources.append(inspect.getsource(cls))
+        except (OSError, TypeError):
+            sources.append(cls.__qualname__)
+    settings = {key: value for key, value in vars(processor).items()
+                if isinstance(value, (str, int, float, bool, list, tuple, type(None)))}
+    return digest(sources, settings)
+
+
+class InsightCache:
+    """Latest insight of each pipeline step, stored under a fingerprint of its source data, processor and upstream inputs."""
+
+    def __init__(self, path=INSIGHT_CACHE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS insights (step TEXT PRIMARY KEY, fingerprint TEXT, insights TEXT, created REAL, plan TEXT)")
+            if "plan" not in [row[1] for row in conn.execute("PRAGMA table_info(insights)")]:
+                conn.execute("ALTER TABLE insights ADD COLUMN plan TEXT")  # Databases written before plans were recorded
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def fingerprint(self, step, inputs):
+        """Fingerprint for running `step` on `inputs`, or None when its data source cannot be fingerprinted."""
+        source = step["data_source"]
+        if source is not None and not hasattr(source, "fingerprint"):
+            return None
+        return digest(source.fingerprint() if source is not None else None, processor_fingerprint(step["processor"]), inputs)
+
+    def plan(self, step):
+        """
+        How a step was planned for a query, without touching its data: the processor (prompts and settings such as the
+        query terms) and which upstream steps fill its inputs.
+        """
+        return digest(processor_fingerprint(step["processor"]), sorted(step["inputs"].items()))
+
+    def entry(self, step_name):
+        """{"fingerprint", "insights", "created", "plan"} of the step's stored insight, or None."""
+        with self.lock, self._connect() as conn:
+            row = conn.execute("SELECT fingerprint, insights, created, plan FROM insights WHERE step = ?", (step_name,)).fetchone()
+        return None if row is None else {"fingerprint": row[0], "insights": json.loads(row[1]), "created": row[2], "plan": row[3]}
+
+    def get(self, step_name, fingerprint, max_age=None):
+        """Stored insight if it was produced from the same fingerprint (and is at most `max_age` seconds old)."""
+        entry = self.entry(step_name)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            return None
+        if max_age is not None and time.time() - entry["created"] > max_age:
+            return None
+        return entry["insights"]
+
+    def fresh(self, step, max_age):
+        """
+        Stored insight of `step` if it is at most `max_age` seconds old and was produced with the same plan, without
+        fingerprinting its data; used to skip a step outright.
+        """
+        entry = self.entry(step["name"])
+        if entry is None or time.time() - entry["created"] > max_age or entry["plan"] != self.plan(step):
+            return None
+        return entry["insights"]
+
+    def put(self, step_name, fingerprint, insights, plan=None):
+        with self.lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO insights (step, fingerprint, insights, created, plan) VALUES (?, ?, ?, ?, ?)",
+                         (step_name, fingerprint, json.dumps(insights, ensure_ascii=False), time.time(), plan))
@@ -1,26 +1,356 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from rich.table import Table
+from rich.console import Console
+from insight_cache import SUMMARY_KEY, digest, processor_fingerprint
+
+console = Console()
+
+class ProgressiveSummary:
+    """Folds step insights into a running summary, one LLM call at a time, while the rest of the pipeline is still running."""
+
+    def __init__(self, summarizer, cache=None):
+        self.summarizer = summarizer
+        self.summary = None
+        self.pending = []
+        self.cache = cache
+        # Cached insights wait here until a fresh one arrives; if none does, the summary itself comes from the cache
+        self.held = []
+        self.live = False
+        self.lock = threading.Lock()
+        # A single worker keeps folds in order; insights arriving during a fold are batched into the next one
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def add(self, description, insights, cached=False):
+        with self.lock:
+            if cached and self.cache and not self.live:
+                self.held.append((description, insights))
+                return
+            self.live = True
+            self.pending.extend(self.held + [(description, insights)])
+            self.held = []
+        self.executor.submit(self.fold)
+
+    def fold(self):
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            self.summary = self.summarizer.fold(self.summary, batch)
+        except Exception:
+            with self.lock:
+                self.pending = batch + self.pending  # Retried by the next fold
+            raise
+
+    def result(self):
+        """Waits for in-flight folds and returns the final summary; a fold that failed is retried here once."""
+        self.executor.shutdown(wait=True)
+        if self.held:
+            return self.cached_summary()
+        self.fold()
+        return self.summary
+
+    def cached_summary(self):
+        """Summary of insights that all came from the cache: reused when the same insights were summarized before."""
+        batch = sorted(self.held)
+        fingerprint = digest(processor_fingerprint(self.summarizer), batch)
+        summary = self.cache.get(SUMMARY_KEY, fingerprint)
+        if summary is None:
+            summary = self.summarizer.fold(None, batch)
+            self.cache.put(SUMMARY_KEY, fingerprint, summary)
+        return summary
+
+
+class AsyncProgressiveSummary:
+    """Event-loop counterpart of ProgressiveSummary: one fold task at a time, batching insights that arrive meanwhile."""
+
+    def __init__(self, summarizer, cache=None):
+        self.summarizer = summarizer
+        self.summary = None
+        self.pending = []
+        self.cache = cache
+        self.held = []
+        self.live = False
+        self.task = None
+
+    def add(self, description, insights, cached=False):
+        if cached and self.cache and not self.live:
+            self.held.append((description, insights))
+            return
+        self.live = True
+        self.pending.extend(self.held + [(description, insights)])
+        self.held = []
+        if self.task is None or self.task.done():
+            if self.task is not None and not self.task.cancelled():
+                self.task.exception()  # A failed batch was put back and is retried by the new task
+            self.task = asyncio.create_task(self.fold())
+
+    async def fold_batch(self, summary, batch):
+        if hasattr(self.summarizer, "afold"):
+            return await self.summarizer.afold(summary, batch)
+        return await asyncio.to_thread(self.summarizer.fold, summary, batch)
+
+    async def fold(self):
+        while self.pending:
+            batch, self.pending = self.pending, []
+            try:
+                self.summary = await self.fold_batch(self.summary, batch)
+            except Exception:
+                self.pending = batch + self.pending
+                raise
+
+    async def result(self):
+        """Waits for the fold in flight and returns the final summary; a fold that failed is retried here once."""
+        if self.task is not None:
+            await asyncio.wait([self.task])
+        if self.held:
+            batch = sorted(self.held)
+            fingerprint = digest(processor_fingerprint(self.summarizer), batch)
+            summary = await asyncio.to_thread(self.cache.get, SUMMARY_KEY, fingerprint)
+            if summary is None:
+                summary = await self.fold_batch(None, batch)
+                await asyncio.to_thread(self.cache.put, SUMMARY_KEY, fingerprint, summary)
+            return summary
+        await self.fold()
+        return self.summary
+
 
 class ParallelReasoningPipeline:
-    def __init__(self):
+    """Runs reasoning steps as a DAG: independent steps in parallel, each dependent step as soon as its inputs resolve."""
+
+    def __init__(self, cache=None, max_age=None, max_workers=None):
         self.steps = []
+        self.trace = {}
+        self.summary = None
+        self.cache = cache
+        self.max_age = max_age  # Steps with a cached insight younger than this are not run at all
+        self.max_workers = max_workers  # Steps running at once; None uses the executor default
 
-    def add_step(self, description, data_source, processor, data_type, color):
+    def add_step(self, description, data_source, processor, data_type, color, name=None, depends_on=None, inputs=None):
+        """
+        Adds an analysis step to the pipeline.
+        `inputs` maps a key of the processor's data to the name of the step whose insight fills it;
+        those steps, plus any in `depends_on`, must finish first. `data_source` may be None for pure hops.
+        """
+        inputs = dict(inputs or {})
         self.steps.append({
+            "name": name or f"step_{len(self.steps) + 1}",
             "description": description,
             "data_source": data_source,
             "processor": processor,
             "data_type": data_type,
-            "color": color
+            "color": color,
+            "inputs": inputs,
+            "depends_on": list(dict.fromkeys(list(depends_on or []) + list(inputs.values())))
         })
 
-    def run(self):
-        results = []
-        with ThreadPoolExecutor() as executor:
-            future_to_step = {executor.submit(self.process_step, step): step for step in self.steps}
-            for future in as_completed(future_to_step):
-                results.append(future.result())
-        return results
-
-    def process_step(self, step):
-        data = step["data_source"].fetch_data()
-        return step["processor"].process(data)
\ No newline at end of file
+    def validate(self):
+        """Checks that step names are unique, dependencies exist and there are no cycles."""
+        names = [step["name"] for step in self.steps]
+        if len(set(names)) != len(names):
+            raise ValueError("Duplicate step names in pipeline")
+        by_name = {step["name"]: step for step in self.steps}
+        for step in self.steps:
+            missing = [d for d in step["depends_on"] if d not in by_name]
+            if missing:
+                raise ValueError(f"Step '{step['name']}' depends on unknown steps: {', '.join(missing)}")
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through step '{name}'")
+            visiting.add(name)
+            for dep in by_name[name]["depends_on"]:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in names:
+            visit(name)
+
+    def run(self, summarizer=None):
+        """
+        Executes the step DAG.
+        Returns {step name: {"description", "insights", "error", "cached", "start", "end", "duration", "depends_on"}} in the
+        order the steps were added. A failed step keeps its error and the steps depending on it are skipped.
+        With a `summarizer`, each insight is folded into a running summary (`self.summary`) as soon as it arrives.
+        With a cache, a step whose fingerprint is unchanged (or whose insight is younger than `max_age`) reuses its stored
+        insight instead of calling the LLM.
+        """
+        self.validate()
+        results = {}
+        pending = list(self.steps)
+        self.trace = {}
+        self.summary = None
+        origin = time.perf_counter()
+        folding = ProgressiveSummary(summarizer, self.cache) if summarizer else None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while pending or running:
+                for step, inputs in self.ready_steps(pending, results):
+                    running[executor.submit(self.process_step, step, inputs, origin)] = step
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    result = future.result()
+                    results[step["name"]] = result
+                    if folding and not result["error"]:
+                        folding.add(step["description"], result["insights"], result["cached"])
+
+        if folding:
+            self.summary = folding.result()
+        return {step["name"]: results[step["name"]] for step in self.steps}
+
+    async def arun(self, summarizer=None):
+        """
+        Async counterpart of run(): every step is a task on the running event loop instead of a pool thread.
+        Processors with `aprocess` and data sources with `afetch_data` run natively; others run in worker threads.
+        `max_workers` caps the number of steps in flight.
+        """
+        self.validate()
+        results = {}
+        pending = list(self.steps)
+        self.trace = {}
+        self.summary = None
+        origin = time.perf_counter()
+        folding = AsyncProgressiveSummary(summarizer, self.cache) if summarizer else None
+        limit = asyncio.Semaphore(self.max_workers) if self.max_workers else None
+
+        running = {}
+        while pending or running:
+            for step, inputs in self.ready_steps(pending, results):
+                running[asyncio.create_task(self.aprocess_step(step, inputs, origin, limit))] = step
+            if not running:
+                continue
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                step = running.pop(task)
+                result = task.result()
+                results[step["name"]] = result
+                if folding and not result["error"]:
+                    folding.add(step["description"], result["insights"], result["cached"])
+
+        if folding:
+            self.summary = await folding.result()
+        return {step["name"]: results[step["name"]] for step in self.steps}
+
+    def ready_steps(self, pending, results):
+        """
+        Removes the steps that can be decided now from `pending`: those with a failed dependency are recorded as skipped,
+        and (step, inputs) is returned for those whose dependencies have all produced insights.
+        """
+        ready = []
+        for step in list(pending):
+            failed = [d for d in step["depends_on"] if d in results and results[d]["error"]]
+            if failed:
+                pending.remove(step)
+                results[step["name"]] = self.skipped_result(step, f"Skipped: upstream step '{failed[0]}' failed")
+            elif all(d in results for d in step["depends_on"]):
+                pending.remove(step)
+                ready.append((step, {key: results[source]["insights"] for key, source in step["inputs"].items()}))
+        return ready
+
+    def process_step(self, step, inputs, origin):
+        """Fetches data, adds the bound upstream insights and processes it. Errors are captured in the result."""
+        start = time.perf_counter() - origin
+        insights, error, cached = None, None, False
+        try:
+            fingerprint = None
+            insights = self.cache.fresh(step, self.max_age) if self.cache and self.max_age is not None else None
+            if insights is None and self.cache:
+                fingerprint = self.cache.fingerprint(step, inputs)
+                insights = self.cache.get(step["name"], fingerprint) if fingerprint else None
+            cached = insights is not None
+            if not cached:
+                data = step["data_source"].fetch_data() if step["data_source"] else {}
+                data.update(inputs)
+                insights = step["processor"].process(data)
+                if fingerprint:
+                    self.cache.put(step["name"], fingerprint, insights, self.cache.plan(step))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return self.step_result(step, insights, error, cached, start, origin)
+
+    async def aprocess_step(self, step, inputs, origin, limit=None):
+        if limit is not None:
+            async with limit:
+                return await self.aprocess_step(step, inputs, origin)
+        start = time.perf_counter() - origin
+        insights, error, cached = None, None, False
+        try:
+            # Fingerprints hash files and query SQLite, so they are computed off the event loop
+            fingerprint = None
+            insights = await asyncio.to_thread(self.cache.fresh, step, self.max_age) if self.cache and self.max_age is not None else None
+            if insights is None and self.cache:
+                fingerprint = await asyncio.to_thread(self.cache.fingerprint, step, inputs)
+                insights = await asyncio.to_thread(self.cache.get, step["name"], fingerprint) if fingerprint else None
+            cached = insights is not None
+            if not cached:
+                source, processor = step["data_source"], step["processor"]
+                if source is None:
+                    data = {}
+                elif hasattr(source, "afetch_data"):
+                    data = await source.afetch_data()
+                else:
+                    data = await asyncio.to_thread(source.fetch_data)
+                data.update(inputs)
+                if hasattr(processor, "aprocess"):
+                    insights = await processor.aprocess(data)
+                else:
+                    insights = await asyncio.to_thread(processor.process, data)
+                if fingerprint:
+                    await asyncio.to_thread(self.cache.put, step["name"], fingerprint, insights, self.cache.plan(step))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return self.step_result(step, insights, error, cached, start, origin)
+
+    def step_result(self, step, insights, error, cached, start, origin):
+        end = time.perf_counter() - origin
+        result = {"description": step["description"], "insights": insights, "error": error, "cached": cached,
+                  "start": start, "end": end, "duration": end - start, "depends_on": step["depends_on"]}
+        self.trace[step["name"]] = result
+        return result
+
+    def skipped_result(self, step, error):
+        return {"description": step["description"], "insights": None, "error": error, "cached": False,
+                "start": None, "end": None, "duration": 0.0, "depends_on": step["depends_on"]}
+
+    def critical_path(self):
+        """Steps on the longest dependency chain: from the last step to finish, back through the latest-finishing dependency."""
+        if not self.trace:
+            return []
+        path = [max(self.trace, key=lambda name: self.trace[name]["end"])]
+        while any(name in self.trace for name in self.trace[path[-1]]["depends_on"]):
+            path.append(max((d for d in self.trace[path[-1]]["depends_on"] if d in self.trace), key=lambda name: self.trace[name]["end"]))
+        return path[::-1]
+
+    def print_trace(self):
+        """Prints per-step start/end times with a timeline bar, marking the critical path."""
+        if not self.trace:
+            return
+        critical = set(self.critical_path())
+        total = max(entry["end"] for entry in self.trace.values()) or 1.0
+        width = 30
+        table = Table(title="Execution Trace", show_header=True, header_style="bold magenta")
+        table.add_column("Step", style="cyan")
+        table.add_column("Depends On", style="dim")
+        table.add_column("Start", justify="right")
+        table.add_column("End", justify="right")
+        table.add_column("Timeline")
+        for name, entry in sorted(self.trace.items(), key=lambda item: item[1]["start"]):
+            begin, end = int(entry["start"] / total * width), max(int(entry["end"] / total * width), int(entry["start"] / total * width) + 1)
+            bar = " " * begin + "█" * (end - begin)
+            style = "bold red" if name in critical else "yellow" if entry["error"] else "green"
+            table.add_row(f"[{style}]{name}[/{style}]", ", ".join(entry["depends_on"]), f"{entry['start']:.2f}s", f"{entry['end']:.2f}s", f"[{style}]{bar}[/{style}]")
+        console.print(table)
+        console.print(f"[bold]Critical path:[/bold] {' → '.join(self.critical_path())} ({total:.2f}s)")
@@ -1,42 +1,196 @@
+import json
+import asyncio
+import threading
 import requests
+from sales_features import SalesAggregator, format_features
+from retrieval import format_passages
+from chunking import count_tokens, limits, map_reduce, amap_reduce
+
+
+def sales_features(data):
+    """Features precomputed by SalesFeatureSource, or aggregated here in one pass over full or chunked rows."""
+    if "sales_features" in data:
+        return data["sales_features"]
+    chunks = data["sql_chunks"] if "sql_chunks" in data else [data["sql_data"]]
+    aggregator = None
+    for chunk in chunks:
+        if chunk and aggregator is None:
+            aggregator = SalesAggregator(data.get("columns") or [f"column_{i}" for i in range(len(chunk[0]))])
+        if chunk:
+            aggregator.add(chunk)
+    return aggregator.features() if aggregator else {"rows": 0}
+
+
+# Passages retrieved per query when feedback comes from a document corpus
+FEEDBACK_TOP_K = 8
+DEFAULT_FEEDBACK_QUERY = "customer feedback complaints problems quality price"
+
+
+def feedback_context(data, query_terms=None, top_k=FEEDBACK_TOP_K):
+    """Full text of a single document, or the top-k corpus passages for the parsed query terms."""
+    if "corpus" not in data:
+        return data["document_text"]
+    query = " ".join(term.replace("Analyze ", "", 1) for term in query_terms or []) or DEFAULT_FEEDBACK_QUERY
+    return format_passages(data["corpus"].search(query, top_k))
+
+
+MODEL = "tinyllama"
+# Seconds to wait for a connection to the Ollama server
+CONNECT_TIMEOUT = 5.0
+_sessions = threading.local()
+
+
+def _session():
+    """One requests session (and so one kept-alive connection pool) per thread for the blocking path."""
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+    return _sessions.session
+
+
+class OllamaBackend:
+    """Shared httpx.AsyncClient and concurrency limit for one Ollama server, bound to the running event loop."""
+
+    _backends = {}
+
+    def __init__(self, api_url, max_concurrency, timeout):
+        self.api_url = api_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.client = None
+        self.semaphore = None
+        self.loop = None
+
+    @classmethod
+    def get(cls, api_url, max_concurrency, timeout):
+        """The backend for `api_url`; its limits are set by the first processor that uses it."""
+        if api_url not in cls._backends:
+            cls._backends[api_url] = cls(api_url, max_concurrency, timeout)
+        return cls._backends[api_url]
+
+    def _bind(self):
+        # Clients and semaphores belong to one event loop; a new asyncio.run() gets fresh ones
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            import httpx  # Only the async runner needs httpx
+            self.client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+            )
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.loop = loop
+
+    async def generate(self, payload):
+        """Streams a generate call and returns the full response text."""
+        self._bind()
+        parts = []
+        async with self.semaphore:
+            async with self.client.stream("POST", self.api_url, json={**payload, "stream": True}) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise RuntimeError(f"Ollama error: {chunk['error']}")
+                    parts.append(chunk.get("response", ""))
+                    if chunk.get("done"):
+                        break
+        return "".join(parts)
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+        self.client = self.semaphore = self.loop = None
+
+
+async def close_backends():
+    """Closes the async clients of all Ollama backends; call before the event loop ends."""
+    for backend in OllamaBackend._backends.values():
+        await backend.aclose()
+
 
 class BaseProcessor:
     """Base processor for interacting with Ollama API."""
     
     def __init__(self, config):
         self.api_url = config.get_api_url()
+        self.max_concurrency = config.max_concurrency
+        self.timeout = config.timeout
+
+    def prompt(self, data):
+        """
+        Returns (instruction, content, system message) for the data, or a final answer string when there is nothing to
+        analyze. Content too large for the model's context is analyzed in chunks that are then combined.
+        """
+        raise NotImplementedError
 
-    def process(self, data, prompt, system_message):
-        response = requests.post(
+    def payload(self, prompt, system_message):
+        return {"model": MODEL, "prompt": prompt, "system": system_message, "options": {"num_ctx": limits(MODEL)["context"]}}
+
+    def generate(self, prompt, system_message):
+        response = _session().post(
             self.api_url,
-            json={
-                "model": "tinyllama",
-                "prompt": prompt,
-                "system": system_message,
-                "stream": False
-            }
+            json={**self.payload(prompt, system_message), "stream": False},
+            timeout=(CONNECT_TIMEOUT, self.timeout)
         )
         return response.json()["response"]
 
+    async def agenerate(self, prompt, system_message):
+        backend = OllamaBackend.get(self.api_url, self.max_concurrency, self.timeout)
+        return await backend.generate(self.payload(prompt, system_message))
+
+    def process(self, data, request=None):
+        request = self.prompt(data) if request is None else request
+        if isinstance(request, str):
+            return request
+        instruction, content, system_message = request
+        return map_reduce(instruction, content, lambda prompt: self.generate(prompt, system_message), MODEL,
+                          overhead=count_tokens(system_message))
+
+    async def aprocess(self, data, request=None):
+        """Async counterpart of process(): streams from the shared client without holding a thread."""
+        request = self.prompt(data) if request is None else request
+        if isinstance(request, str):
+            return request
+        instruction, content, system_message = request
+        return await amap_reduce(instruction, content, lambda prompt: self.agenerate(prompt, system_message), MODEL,
+                                 overhead=count_tokens(system_message))
+
 
 class SalesProcessor(BaseProcessor):
-    def process(self, data):
-        if not data["sql_data"]:
+    def prompt(self, data):
+        features = sales_features(data)
+        if not features["rows"]:
             return "No sales data available."
-        sales_records = "\n".join([str(record) for record in data["sql_data"]])
-        return super().process(data, f"Analyze the following sales data:\n\n{sales_records}", "You are an expert business analyst.")
+        sales_summary = format_features(features)
+        return "Analyze the following sales statistics (computed from the sales data):", sales_summary, "You are an expert business analyst."
 
 
 class FeedbackProcessor(BaseProcessor):
-    def process(self, data):
-        return super().process(data, f"Analyze customer feedback:\n\n{data['document_text']}", "You are an expert in sentiment analysis.")
+    def __init__(self, config, query_terms=None, top_k=FEEDBACK_TOP_K):
+        super().__init__(config)
+        self.query_terms = query_terms
+        self.top_k = top_k
+
+    def prompt(self, data):
+        feedback_text = feedback_context(data, self.query_terms, self.top_k)
+        return "Analyze customer feedback:", feedback_text, "You are an expert in sentiment analysis."
 
 
 class CompetitorProcessor(BaseProcessor):
-    def process(self, data):
-        return super().process(data, f"Analyze competitor data:\n\n{data['competitors']}", "You are an expert in competitor analysis.")
+    def prompt(self, data):
+        return "Analyze competitor data:", str(data['competitors']), "You are an expert in competitor analysis."
 
 
 class MarketTrendsProcessor(BaseProcessor):
-    def process(self, data):
-        return super().process(data, f"Analyze market trends:\n\n{data['market_trends']}", "You are an expert market analyst.")
\ No newline at end of file
+    def prompt(self, data):
+        return "Analyze market trends:", str(data['market_trends']), "You are an expert market analyst."
+
+
+class CorrelationProcessor(BaseProcessor):
+    def prompt(self, data):
+        findings = "\n\n".join(f"{key.replace('_', ' ').title()}:\n{value}" for key, value in data.items() if isinstance(value, str) and value.strip())
+        if not findings:
+            return "No upstream insights available."
+        return ("Using the following findings from separate analyses, identify which factors explain each other "
+                "and rank the likely root causes:", findings, "You are an expert business analyst who connects evidence across data sources.")
\ No newline at end of file
@@ -3,8 +3,10 @@ import requests
 class QueryParser:
     """Parses user queries using LLM to extract actionable tasks"""
     
-    def __init__(self):
-        self.base_url = "http://localhost:11434/api/chat"
+    def __init__(self, config):
+        # Same Ollama server as the processors, on its chat endpoint
+        self.base_url = config.get_api_url().rsplit("/", 1)[0] + "/chat"
+        self.timeout = config.timeout
 
     def parse(self, query):
         """Extracts key analysis targets from user query"""
@@ -24,7 +26,8 @@ class QueryParser:
                     {"role": "user", "content": prompt}
                 ],
                 "stream": False
-            }
+            },
+            timeout=self.timeout
         )
         
         response_text = response.json()["message"]["content"]
@@ -0,0 +1,170 @@
+import os
+import re
+import math
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+# Chunks are windows of CHUNK_WORDS words overlapping by CHUNK_OVERLAP words
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 20
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60  # Reciprocal-rank-fusion constant for merging the BM25 and vector rankings
+DOCUMENT_EXTENSIONS = (".pdf", ".txt", ".md")
+STOPWORDS = set("""a an and are as at be but by for from has have in is it its of on or that the this to was were will with
+analyze analyse about what which why how key factors driving""".split())
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT);
+CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, path TEXT, position INTEGER, digest TEXT,
+                                   text TEXT, length INTEGER, norm REAL);
+CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path);
+CREATE TABLE IF NOT EXISTS postings (term TEXT, chunk_id INTEGER, tf INTEGER);
+CREATE INDEX IF NOT EXISTS postings_term ON postings (term);
+CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk_id);
+"""
+
+
+def tokenize(text):
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def chunk_text(text, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Splits text into overlapping word windows."""
+    words = text.split()
+    step = max(1, size - overlap)
+    return [" ".join(words[i:i + size]) for i in range(0, max(1, len(words) - overlap), step) if words[i:i + size]]
+
+
+def term_counts(text):
+    counts = {}
+    for term in tokenize(text):
+        counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+class CorpusIndex:
+    """
+    Incremental on-disk index over a directory of documents: a BM25 inverted index plus sparse TF-IDF
+    vectors (log-tf, cosine-normalised), merged with reciprocal rank fusion at query time.
+    """
+
+    def __init__(self, directory, db_path=os.path.join(".cache", "corpus_index.db")):
+        self.directory = os.path.abspath(directory)
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Connection for one transaction: committed on success, rolled back on error, then closed."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def documents(self):
+        for root, _, files in os.walk(self.directory):
+            for name in sorted(files):
+                if name.lower().endswith(DOCUMENT_EXTENSIONS):
+                    yield os.path.join(root, name)
+
+    def update(self, read_text):
+        """
+        Brings the index up to date with the directory. Unchanged files (same size and mtime) are skipped;
+        for changed files only chunks whose text changed are re-indexed. Returns (files changed, chunks added).
+        """
+        changed_files, added_chunks = 0, 0
+        with self.lock, self._connect() as conn:
+            known = {row[0]: row[1:] for row in conn.execute("SELECT path, size, mtime_ns FROM documents "
+                                                             "WHERE path LIKE ?", (self.directory + os.sep + "%",))}
+            present = set()
+            for path in self.documents():
+                present.add(path)
+                stat = os.stat(path)
+                if known.get(path) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                changed_files += 1
+                added_chunks += self._index_document(conn, path, read_text(path), stat)
+            for path in set(known) - present:
+                self._remove_chunks(conn, [row[0] for row in conn.execute("SELECT id FROM chunks WHERE path = ?", (path,))])
+                conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+                changed_files += 1
+        return changed_files, added_chunks
+
+    def _index_document(self, conn, path, text, stat):
+        chunks = chunk_text(text)
+        digests = [hashlib.sha1(chunk.encode("utf-8")).hexdigest() for chunk in chunks]
+        existing = {digest: chunk_id for chunk_id, digest in conn.execute("SELECT id, digest FROM chunks WHERE path = ?", (path,))}
+        self._remove_chunks(conn, [chunk_id for digest, chunk_id in existing.items() if digest not in digests])
+        added = 0
+        for position, (chunk, digest) in enumerate(zip(chunks, digests)):
+            if digest in existing:
+                conn.execute("UPDATE chunks SET position = ? WHERE id = ?", (position, existing[digest]))
+                continue
+            counts = term_counts(chunk)
+            norm = math.sqrt(sum((1 + math.log(tf)) ** 2 for tf in counts.values())) or 1.0
+            chunk_id = conn.execute("INSERT INTO chunks (path, position, digest, text, length, norm) VALUES (?, ?, ?, ?, ?, ?)",
+                                    (path, position, digest, chunk, sum(counts.values()), norm)).lastrowid
+            conn.executemany("INSERT INTO postings VALUES (?, ?, ?)", [(term, chunk_id, tf) for term, tf in counts.items()])
+            existing[digest] = chunk_id
+            added += 1
+        conn.execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)",
+                     (path, stat.st_size, stat.st_mtime_ns, hashlib.sha1(text.encode("utf-8")).hexdigest()))
+        return added
+
+    def _remove_chunks(self, conn, chunk_ids):
+        for chunk_id in chunk_ids:
+            conn.execute("DELETE FROM postings WHERE chunk_id = ?", (chunk_id,))
+            conn.execute("DELETE FROM chunks WHERE id = ?", (chunk_id,))
+
+    def search(self, query, top_k=5):
+        """Top-k passages for the query as [{"path", "position", "text", "score"}]."""
+        query_counts = term_counts(query)
+        if not query_counts:
+            return []
+        prefix = self.directory + os.sep + "%"
+        with self.lock, self._connect() as conn:
+            total, avg_length = conn.execute("SELECT COUNT(*), AVG(length) FROM chunks WHERE path LIKE ?", (prefix,)).fetchone()
+            if not total:
+                return []
+            bm25, dot, norms = {}, {}, {}
+            query_weights = {}
+            for term, qtf in query_counts.items():
+                rows = conn.execute("SELECT p.chunk_id, p.tf, c.length, c.norm FROM postings p JOIN chunks c ON c.id = p.chunk_id "
+                                    "WHERE p.term = ? AND c.path LIKE ?", (term, prefix)).fetchall()
+                if not rows:
+                    continue
+                df = len(rows)
+                idf = math.log((total - df + 0.5) / (df + 0.5) + 1)
+                query_weights[term] = (1 + math.log(qtf)) * math.log(total / df + 1)
+                for chunk_id, tf, length, norm in rows:
+                    norms[chunk_id] = norm
+                    bm25[chunk_id] = bm25.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (
+                        tf + BM25_K1 * (1 - BM25_B + BM25_B * length / (avg_length or 1)))
+                    dot[chunk_id] = dot.get(chunk_id, 0.0) + query_weights[term] * (1 + math.log(tf))
+            if not bm25:
+                return []
+            query_norm = math.sqrt(sum(w * w for w in query_weights.values())) or 1.0
+            cosine = {chunk_id: value / (norms[chunk_id] * query_norm) for chunk_id, value in dot.items()}
+
+            fused = {}
+            for scores in (bm25, cosine):
+                for rank, chunk_id in enumerate(sorted(scores, key=scores.get, reverse=True)):
+                    fused[chunk_id] = fused.get(chunk_id, 0.0) + 1 / (RRF_K + rank + 1)
+            best = sorted(fused, key=fused.get, reverse=True)[:top_k]
+            rows = {row[0]: row[1:] for row in conn.execute(
+                f"SELECT id, path, position, text FROM chunks WHERE id IN ({','.join('?' * len(best))})", best)}
+        return [{"path": os.path.relpath(rows[i][0], self.directory), "position": rows[i][1], "text": rows[i][2],
+                 "score": fused[i]} for i in best]
+
+
+def format_passages(passages):
+    """Renders retrieved passages with their source for a prompt."""
+    return "\n\n".join(f"[{p['path']} #{p['position'] + 1}] {p['text']}" for p in passages)
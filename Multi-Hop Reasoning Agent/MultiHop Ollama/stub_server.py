@@ -0,0 +1,103 @@
+import json
+import time
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+# Paginated JSON served at /<name>?page=N, for running the APIDataSource network path offline
+FIXTURES = {
+    "competitors": [
+        {"competitor": "Brand A", "region": "Region A", "offer": "Durable products at competitive prices", "price_change": "-8%"},
+        {"competitor": "Brand A", "region": "Region A", "offer": "Two-year warranty on all products", "price_change": "0%"},
+        {"competitor": "Brand B", "region": "Region A", "offer": "Bundle discount with accessories", "price_change": "-5%"},
+        {"competitor": "Brand B", "region": "Region B", "offer": "Free shipping on orders over $50", "price_change": "0%"},
+        {"competitor": "Brand C", "region": "Region A", "offer": "Eco-friendly product line launched", "price_change": "+3%"},
+    ],
+    "market-trends": [
+        {"trend": "Sustainability", "region": "Region A", "signal": "Growing demand for sustainable and durable products", "change": "+12%"},
+        {"trend": "Online sales", "region": "All", "signal": "Share of online purchases keeps rising", "change": "+6%"},
+        {"trend": "Price sensitivity", "region": "Region A", "signal": "Customers compare prices more often before buying", "change": "+9%"},
+        {"trend": "Durability", "region": "Region A", "signal": "Reviews increasingly mention product lifetime", "change": "+15%"},
+    ],
+}
+PAGE_SIZE = 2
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so clients can reuse connections
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        name = url.path.strip("/")
+        self.server.requests.append(self.path)
+        if name not in self.server.fixtures:
+            return self.send_json(404, {"error": f"Unknown fixture: {name}"})
+        page = int(parse_qs(url.query).get("page", ["1"])[0])
+        records = self.server.fixtures[name]
+        size = self.server.page_size
+        body = {"items": records[(page - 1) * size:page * size], "page": page}
+        if page * size < len(records):
+            body["next"] = f"/{name}?page={page + 1}"
+
+        payload = json.dumps(body).encode("utf-8")
+        etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+        last_modified = self.server.modified[name]
+        since = self.headers.get("If-Modified-Since")
+        if self.headers.get("If-None-Match") == etag or (
+                not self.headers.get("If-None-Match") and since and parsedate_to_datetime(since).timestamp() >= int(last_modified)):
+            self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_json(200, body, {"ETag": etag, "Last-Modified": formatdate(last_modified, usegmt=True)})
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port=0, page_size=PAGE_SIZE, fixtures=None):
+    """Serves the fixtures from a background thread. Returns (server, base URL); stop it with server.shutdown()."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.fixtures = {name: list(records) for name, records in (fixtures or FIXTURES).items()}
+    server.modified = {name: time.time() for name in server.fixtures}
+    server.page_size = page_size
+    server.requests = []
+    server.not_modified = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def update_fixture(server, name, records):
+    """Replaces a fixture and bumps its Last-Modified, as an upstream API change would."""
+    server.fixtures[name] = list(records)
+    server.modified[name] = max(time.time(), server.modified[name] + 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve competitor and market-trend fixtures over HTTP.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+    server, base_url = start_stub_server(args.port, args.page_size)
+    print(f"Serving {', '.join(f'{base_url}/{name}' for name in server.fixtures)} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,6 +1,26 @@
 from processing import BaseProcessor
 
+def insight_texts(insights):
+    """Insight strings from a list, or from the step results returned by ParallelReasoningPipeline.run (failed steps dropped)."""
+    if isinstance(insights, dict):
+        return [result["insights"] for result in insights.values() if not result["error"]]
+    return list(insights)
+
+SYSTEM_MESSAGE = "Create a concise, actionable summary of the following business insights."
+
 class SummarizationProcessor(BaseProcessor):
-    def process(self, insights):
-        combined_text = " ".join(insights)
-        return super().process(insights, combined_text, "Create a concise, actionable summary of the following business insights.")
\ No newline at end of file
+    def prompt(self, insights):
+        return "", "\n\n".join(insight_texts(insights)), SYSTEM_MESSAGE
+
+    def fold_prompt(self, summary, updates):
+        findings = "\n\n".join(f"{description}:\n{insights}" for description, insights in updates)
+        if summary is None:
+            return "", findings, SYSTEM_MESSAGE
+        return f"Current summary:\n{summary}\n\nUpdate it with these new findings, keeping it concise:", findings, SYSTEM_MESSAGE
+
+    def fold(self, summary, updates):
+        """Folds new (step description, insights) pairs into the running summary; starts one if there is none yet."""
+        return self.process(updates, self.fold_prompt(summary, updates))
+
+    async def afold(self, summary, updates):
+        return await self.aprocess(updates, self.fold_prompt(summary, updates))
\ No newline at end of file
@@ -1,13 +1,14 @@
 import os
+import re
 import json
+import asyncio
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from langchain.schema import SystemMessage, HumanMessage
 from rich.console import Console
-from rich.markdown import Markdown
 from rich.table import Table
 from rich.panel import Panel
-import google.generativeai as genai
+from providers import ProviderRouter, LazyChatGroq, build_providers, chat_messages
+from rate_limit import TokenBucketLimiter
+from journal import RunJournal, load_run, run_state
 
 # Load environment variables
 load_dotenv()
@@ -15,75 +16,219 @@ console = Console()
 
 # Load API keys
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+# Summarization providers in order of preference, e.g. "gemini,groq" or "stub" for offline runs
+SUMMARY_PROVIDERS = os.getenv("SUMMARY_PROVIDERS", "gemini,groq")
+
+# Groq account quotas; sub-agents run concurrently within these limits
+GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = int(os.getenv("GROQ_TPM", "5000"))
+
+DECOMPOSITION_PROMPT = """Break down this problem into clear sub-tasks based on complexity (at most {max_tasks}).
+For each sub-task give a meaningful and concise name for the agent responsible for it.
+Respond with JSON only, in this form:
+{{"sub_agents": [{{"name": "Agent Name", "task": "Sub-task title", "depends_on": ["Name of an earlier agent"]}}]}}
+"depends_on" lists earlier agents whose findings this task needs; leave it empty if there are none.
+
+Problem: {problem}"""
+
+def unique_name(name, taken):
+    """`name`, or `name 2`, `name 3`, ... when it is already in `taken`; the returned name is added to `taken`."""
+    candidate, n = name, 1
+    while candidate in taken:
+        n += 1
+        candidate = f"{name} {n}"
+    taken.add(candidate)
+    return candidate
+
+def parse_decomposition(content, max_tasks):
+    """
+    Parse the JSON decomposition into [{"name", "task", "depends_on"}]. Items without a task are dropped and
+    repeated names are numbered. Returns None only when the reply is not JSON at all.
+    """
+    text = re.sub(r"^```(?:json)?|```$", "", content.strip(), flags=re.MULTILINE).strip()
+    start = min([i for i in (text.find("{"), text.find("[")) if i != -1], default=-1)
+    if start == -1:
+        return None
+    try:
+        data, _ = json.JSONDecoder().raw_decode(text[start:])
+    except ValueError:
+        # A reply that starts as JSON is broken JSON, not a list of sub-tasks; prose may just contain a brace
+        return [] if start == 0 else None
+    items = data.get("sub_agents", data.get("tasks")) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return []
+
+    plan, taken = [], set()
+    for item in items:
+        if len(plan) == max_tasks:
+            break
+        if not isinstance(item, dict) or not str(item.get("task") or "").strip():
+            continue
+        depends_on = item.get("depends_on") if isinstance(item.get("depends_on"), list) else []
+        # Keep only dependencies on earlier agents, so the plan can always run in order
+        depends_on = [d for d in dict.fromkeys(map(str, depends_on)) if d in taken]
+        name = str(item.get("name") or "").strip()
+        plan.append({
+            "name": unique_name(name, taken) if name else "",
+            "task": str(item["task"]).strip(),
+            "depends_on": depends_on,
+        })
+    return plan
 
 class DistributedReasoningAgent:
-    def __init__(self, model="mixtral-8x7b-32768"):
-        self.llm = ChatGroq(model_name=model, groq_api_key=GROQ_API_KEY)
+    def __init__(self, model="mixtral-8x7b-32768", summary_router=None, max_sub_tasks=5, journal=None):
+        self.llm = LazyChatGroq(model, GROQ_API_KEY)
+        self.summary_router = summary_router or ProviderRouter(build_providers(SUMMARY_PROVIDERS.split(","), groq_model=model))
+        self.max_sub_tasks = max_sub_tasks
+        self.limiter = TokenBucketLimiter(rpm=GROQ_RPM, tpm=GROQ_TPM)
+        self.journal = journal or RunJournal()
+        self.problem = None
+        self.plan = []
         self.sub_agents = []
         self.output_data = {}
 
-    def generate_sub_tasks(self, user_input):
-        """Dynamically generate sub-tasks based on the problem statement."""
+    @classmethod
+    def resume(cls, run_id, **kwargs):
+        """Rebuild an interrupted run from its journal; sub-agents with journaled results are not re-run."""
+        state = run_state(load_run(run_id))
+        if state["problem"] is None:
+            raise ValueError(f"No journaled run with id {run_id}")
+        if state["status"] == "completed":
+            raise ValueError(f"Run {run_id} already completed")
+
+        agent = cls(journal=RunJournal(run_id=run_id), **kwargs)
+        agent.problem = state["problem"]
+        agent.plan = state["plan"]
+        agent.output_data = {"sub_tasks": state["sub_tasks"], "plan": state["plan"]}
+        agent.journal.write("run_resume", completed=list(state["results"]))
+        console.print(f"[bold cyan]Resuming run {run_id}:[/bold cyan] {len(state['results'])} sub-agent result(s) already journaled")
+
+        for entry in state["sub_agents"]:
+            sub_agent = SubAgent(entry["name"], entry["task"], agent.llm, depends_on=entry["depends_on"])
+            sub_agent.result = state["results"].get(entry["name"])
+            agent.sub_agents.append(sub_agent)
+        sub_tasks = state["sub_tasks"] or agent.generate_sub_tasks(state["problem"], journal_start=False)
+        if len(sub_tasks) > len(agent.sub_agents):
+            # Keep the planned names and dependencies of the agents still to be created
+            done = len(agent.sub_agents)
+            agent.create_sub_agents(sub_tasks[done:], entries=agent.plan[done:] if agent.plan else None)
+        return agent
+
+    def generate_sub_tasks(self, user_input, journal_start=True):
+        """Generate sub-tasks, agent names and dependencies in a single structured LLM call."""
         console.print(Panel("Step 1: Problem Decomposition", title="[bold cyan]Process[/bold cyan]", border_style="cyan"))
+        self.problem = user_input
+        if journal_start:
+            self.journal.write("run_start", sync=True, problem=user_input)
         
-        response = self.llm.invoke([
-            SystemMessage(content="You are an expert task decomposer."),
-            HumanMessage(content=f"Break down this problem into clear sub-tasks based on complexity. Only provide the sub-task titles, without any descriptions: {user_input}")
-        ])
+        response = self.llm.invoke(chat_messages(
+            "You are an expert task decomposer. You reply with JSON only.",
+            DECOMPOSITION_PROMPT.format(max_tasks=self.max_sub_tasks, problem=user_input)
+        ))
         
-        sub_tasks = response.content.strip().split("\n")
-        sub_tasks = [task.strip() for task in sub_tasks if task.strip()]
+        plan = parse_decomposition(response.content, self.max_sub_tasks)
+        self.plan = plan or []
+        if self.plan:
+            sub_tasks = [entry["task"] for entry in self.plan]
+        elif plan is None:
+            # Fall back to one sub-task per line; agents are then named in create_sub_agents
+            console.print("[yellow]Decomposition was not JSON; falling back to line-separated sub-tasks.[/yellow]")
+            sub_tasks = [task.strip() for task in response.content.strip().split("\n") if task.strip()]
+            sub_tasks = sub_tasks[:self.max_sub_tasks]
+        else:
+            console.print("[yellow]Decomposition had no usable sub-tasks; treating the whole problem as one.[/yellow]")
+            sub_tasks = [user_input]
 
         table = Table(title="Generated Sub-Tasks", show_header=True, header_style="bold magenta")
         table.add_column("Task Number", justify="center", style="bold yellow")
         table.add_column("Task Description", style="bold green")
+        table.add_column("Agent", style="cyan")
+        table.add_column("Depends On", style="dim")
 
         for i, task in enumerate(sub_tasks, 1):
-            table.add_row(str(i), task)
+            entry = self.plan[i - 1] if self.plan else {}
+            table.add_row(str(i), task, entry.get("name", ""), ", ".join(entry.get("depends_on", [])))
         
         console.print(table)
         self.output_data["sub_tasks"] = sub_tasks
+        self.output_data["plan"] = self.plan
+        self.journal.write("sub_tasks", sub_tasks=sub_tasks, plan=self.plan)
         return sub_tasks
 
-    def create_sub_agents(self, sub_tasks):
-        """Create sub-agents dynamically based on the generated sub-tasks."""
+    def create_sub_agents(self, sub_tasks, entries=None):
+        """
+        Create sub-agents for the sub-tasks, using the names from the decomposition where available.
+        `entries` are the plan entries of the given sub-tasks; by default the plan is used when it covers exactly these tasks.
+        """
         console.print(Panel("Step 2: Sub-Agent Creation and Task Assignment", title="[bold cyan]Process[/bold cyan]", border_style="cyan"))
         
-        for task in sub_tasks:
-            response = self.llm.invoke([
-                SystemMessage(content="You are an expert in naming agents based on their tasks."),
-                HumanMessage(content=f"Generate a meaningful and concise name for an agent responsible for this task. Only provide the name, without any description: {task}")
-            ])
-            agent_name = response.content.strip()
+        if entries is None:
+            entries = self.plan if [entry["task"] for entry in self.plan] == list(sub_tasks) else []
+        planned = list(entries) + [{}] * (len(sub_tasks) - len(entries))
+        taken = {agent.name for agent in self.sub_agents}
+        for task, entry in zip(sub_tasks, planned):
+            # Results are keyed by agent name, so generated names must not repeat
+            agent_name = unique_name(entry.get("name") or self.name_agent(task), taken)
             
-            sub_agent = SubAgent(agent_name, task, self.llm)
+            sub_agent = SubAgent(agent_name, task, self.llm, depends_on=entry.get("depends_on", []))
             self.sub_agents.append(sub_agent)
+            self.journal.write("sub_agent", name=agent_name, task=task, depends_on=sub_agent.depends_on)
             console.print(f"[bold green]✔ Created Sub-Agent:[/bold green] {agent_name}")
 
+    def name_agent(self, task):
+        """Ask the LLM for an agent name; only used when the decomposition did not provide one."""
+        response = self.llm.invoke(chat_messages(
+            "You are an expert in naming agents based on their tasks.",
+            f"Generate a meaningful and concise name for an agent responsible for this task. Only provide the name, without any description: {task}"
+        ))
+        return response.content.strip()
+
     def execute(self):
         """Execute the problem-solving process."""
         console.print(Panel("Step 3: Task Execution", title="[bold cyan]Process[/bold cyan]", border_style="cyan"))
-        results = {}
-        
-        for agent in self.sub_agents:
-            agent.execute_task()
-            results[agent.name] = agent.result
+        try:
+            results = asyncio.run(self.execute_sub_agents())
+        except BaseException as e:
+            self.journal.write("run_end", status="failed", error=str(e) or type(e).__name__)
+            self.journal.close()
+            console.print(f"[red]Run {self.journal.run_id} failed; resume it with: python main.py --resume {self.journal.run_id}[/red]")
+            raise
+        if self.limiter.waited:
+            console.print(f"[dim]Rate limiter held requests for {self.limiter.waited:.1f}s to stay within {GROQ_RPM} RPM / {GROQ_TPM} TPM.[/dim]")
         
         console.print(Panel("Step 4: Result Synthesis and Summarization", title="[bold cyan]Process[/bold cyan]", border_style="cyan"))
         summarized_solution = self.summarize_results(results)
+        self.journal.write("summary", summary=summarized_solution, provider=self.summary_router.last_provider)
         
         console.print(Panel(summarized_solution, title="[bold cyan]🌟 Final Solution 🌟[/bold cyan]", border_style="green"))
         
         self.output_data["sub_agent_results"] = results
         self.output_data["summarized_solution"] = summarized_solution
+        self.output_data["summary_provider"] = self.summary_router.last_provider
+        self.summary_router.print_stats()
         self.save_output()
 
+    async def execute_sub_agents(self):
+        """Run all sub-agents concurrently under the rate limiter; an agent starts once its dependencies finish."""
+        running = {}
+
+        async def run(agent):
+            if agent.result is not None:
+                return agent.result  # Journaled by an earlier, interrupted attempt of this run
+            await asyncio.gather(*(running[name] for name in agent.depends_on if name in running))
+            context = {name: running[name].result() for name in agent.depends_on if name in running}
+            await agent.aexecute_task(context, self.limiter)
+            self.journal.write("result", name=agent.name, result=agent.result)
+            return agent.result
+
+        for agent in self.sub_agents:
+            running[agent.name] = asyncio.ensure_future(run(agent))
+        await asyncio.gather(*running.values())
+        return {agent.name: agent.result for agent in self.sub_agents}
+
     def summarize_results(self, results):
-        """Summarize the findings using Google's Gemini model."""
+        """Summarize the findings on the fastest healthy provider, hedging slow calls."""
         findings_summary = "\n".join([f"[bold yellow]{agent_name}:[/bold yellow] {result}" for agent_name, result in results.items()])
         
         prompt = f"""
@@ -99,34 +244,52 @@ class DistributedReasoningAgent:
 
         Provide the summary in a structured format with key points highlighted.
         """
-
-        # Initialize the Gemini model
-        model = genai.GenerativeModel("gemini-1.5-pro")
-    
-        # Generate the response
-        response = model.generate_content(prompt)
-        return response.text
+        return self.summary_router.complete(None, prompt)
 
     def save_output(self):
-        """Save the output data to a JSON file."""
-        with open("output.json", "w", encoding="utf-8") as f:
-            json.dump(self.output_data, f, indent=4, ensure_ascii=False)
-        console.print("[bold cyan]✔ Output saved to output.json[/bold cyan]")
+        """Close the run in the journal; earlier runs are kept (see journal_tool.py to query or export them)."""
+        self.journal.write("run_end", status="completed")
+        self.journal.close()
+        console.print(f"[bold cyan]✔ Run {self.journal.run_id} saved to {self.journal.path}[/bold cyan]")
 
 class SubAgent:
-    def __init__(self, name, task, llm):
+    def __init__(self, name, task, llm, depends_on=None):
         self.name = name
         self.task = task
         self.llm = llm
+        self.depends_on = depends_on or []
         self.result = None
 
-    def execute_task(self):
+    def build_message(self, context=None):
+        """Task instruction, preceded by the findings of the agents this one depends on."""
+        message = f"Perform this task: {self.task}"
+        if context:
+            findings = "\n".join(f"{name}: {result}" for name, result in context.items())
+            message = f"Findings from earlier agents:\n{findings}\n\n{message}"
+        return message
+
+    def execute_task(self, context=None):
         """Execute the task assigned to this sub-agent."""
         console.print(f"[yellow]🔄 Executing {self.name}...[/yellow]")
-        response = self.llm.invoke([
-            SystemMessage(content=f"Role: {self.name}"),
-            HumanMessage(content=f"Perform this task: {self.task}")
-        ])
+        response = self.llm.invoke(chat_messages(f"Role: {self.name}", self.build_message(context)))
+        self.result = response.content
+        console.print(Panel(f"{self.result}", title=f"[bold green]✔ Findings from {self.name}[/bold green]", border_style="green"))
+
+    async def aexecute_task(self, context=None, limiter=None, retries=3):
+        """Execute the task asynchronously, waiting on the rate limiter and backing off on rate-limit errors."""
+        message = self.build_message(context)
+        for attempt in range(retries + 1):
+            if limiter:
+                await limiter.acquire(self.name + message)
+            console.print(f"[yellow]🔄 Executing {self.name}...[/yellow]")
+            try:
+                response = await self.llm.ainvoke(chat_messages(f"Role: {self.name}", message))
+                break
+            except Exception as e:
+                if attempt == retries or "429" not in str(e) and "rate limit" not in str(e).lower():
+                    raise
+                console.print(f"[yellow]{self.name} was rate limited; retrying in {2 ** attempt}s[/yellow]")
+                await asyncio.sleep(2 ** attempt)
         self.result = response.content
         console.print(Panel(f"{self.result}", title=f"[bold green]✔ Findings from {self.name}[/bold green]", border_style="green"))
 
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Modules that should only be imported when a run actually calls that backend
+LAZY_MODULES = ("langchain_groq", "langchain", "google.generativeai")
+
+
+def import_profile(module):
+    """
+    Import `module` in a fresh interpreter under -X importtime.
+    Returns (wall seconds, {module: cumulative us}, {direct import of `module`: cumulative us}).
+    """
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=HERE, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"import {module} failed")
+
+    cumulative, children, direct = {}, {}, {}
+    for line in proc.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # Nested imports are indented and listed before their parent
+        cumulative[name.strip()] = int(cum)
+        if depth == 1:
+            children[name.strip()] = int(cum)
+        elif depth == 0:
+            if name.strip() == module:
+                direct = children
+            children = {}
+    return elapsed, cumulative, direct
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the agent CLI.")
+    parser.add_argument("--module", default="agent", help="Module to import (default: agent).")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time; the median is reported.")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list.")
+    parser.add_argument("--budget-ms", type=float, help="Exit with status 1 if the median start-up exceeds this.")
+    args = parser.parse_args()
+
+    try:
+        runs = [import_profile(args.module) for _ in range(max(1, args.runs))]
+    except RuntimeError as e:
+        console.print(f"[red]Import failed: {e}[/red]")
+        sys.exit(2)
+    median_ms = statistics.median(run[0] for run in runs) * 1000
+    _, cumulative, direct = runs[-1]
+
+    table = Table(title=f"Slowest imports for 'import {args.module}'", show_header=True, header_style="bold magenta")
+    table.add_column("Module", style="cyan")
+    table.add_column("Cumulative", justify="right", style="yellow")
+    table.add_row(f"[bold]{args.module}[/bold]", f"{cumulative.get(args.module, 0) / 1000:.1f} ms")
+    for name, us in sorted(direct.items(), key=lambda item: -item[1])[:args.top]:
+        table.add_row(f"  {name}", f"{us / 1000:.1f} ms")
+    console.print(table)
+    console.print(f"[bold]Median start-up ({len(runs)} runs):[/bold] {median_ms:.0f} ms")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in cumulative]
+    if eager:
+        console.print(f"[red]Imported at start-up but should be lazy: {', '.join(eager)}[/red]")
+        failed = True
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        console.print(f"[red]Start-up exceeds the {args.budget_ms:.0f} ms budget[/red]")
+        failed = True
+    sys.exit(1 if failed else 0)
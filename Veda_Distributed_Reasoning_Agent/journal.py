@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import uuid
+import threading
+
+JOURNAL_PATH = "runs.jsonl"
+INDEX_PATH = "runs_index.json"
+
+
+class RunJournal:
+    """Append-only JSONL journal of one run; every event is flushed, fsync is batched."""
+
+    def __init__(self, path=JOURNAL_PATH, run_id=None, fsync_every=8, fsync_interval=1.0):
+        self.path = path
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, event, sync=False, **data):
+        """Append one event; fsync after `fsync_every` events, `fsync_interval` seconds, or when `sync` is set."""
+        record = {"run_id": self.run_id, "ts": time.time(), "event": event, **data}
+        with self.lock:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.file.flush()
+            self.pending += 1
+            if sync or self.pending >= self.fsync_every or time.monotonic() - self.last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self._sync()
+                self.file.close()
+
+
+def iter_events(path=JOURNAL_PATH, offset=0):
+    """Yield (offset, event) for each intact line; a torn last line from a crash is skipped."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            position = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            try:
+                yield position, json.loads(line)
+            except ValueError:
+                continue
+
+
+def load_run(run_id, path=JOURNAL_PATH, index=None):
+    """All events of one run, in order. Uses the index (if given) to start reading at the run's first event."""
+    offset = (index or {}).get(run_id, {}).get("offset", 0)
+    return [event for _, event in iter_events(path, offset) if event.get("run_id") == run_id]
+
+
+def run_state(events):
+    """Fold a run's events into the state needed to report on or resume it."""
+    state = {"problem": None, "sub_tasks": [], "plan": [], "sub_agents": [], "results": {},
+             "summary": None, "summary_provider": None, "status": "incomplete"}
+    for event in events:
+        kind = event["event"]
+        if kind == "run_start":
+            state["problem"] = event["problem"]
+        elif kind == "sub_tasks":
+            state["sub_tasks"] = event["sub_tasks"]
+            state["plan"] = event.get("plan", [])
+        elif kind == "sub_agent":
+            state["sub_agents"].append({"name": event["name"], "task": event["task"], "depends_on": event.get("depends_on", [])})
+        elif kind == "result":
+            state["results"][event["name"]] = event["result"]
+        elif kind == "summary":
+            state["summary"] = event["summary"]
+            state["summary_provider"] = event.get("provider")
+        elif kind == "run_end":
+            state["status"] = event.get("status", "completed")
+        elif kind == "run_resume":
+            state["status"] = "incomplete"
+    return state
@@ -0,0 +1,135 @@
+import os
+import json
+import argparse
+from rich.console import Console
+from rich.table import Table
+from rich.panel import Panel
+from journal import JOURNAL_PATH, INDEX_PATH, iter_events, load_run, run_state
+
+console = Console()
+
+
+def build_index(path=JOURNAL_PATH, index_path=INDEX_PATH):
+    """Scan the journal once and write a per-run index (problem, status, counts, offset of the first event)."""
+    runs = {}
+    for offset, event in iter_events(path):
+        run = runs.setdefault(event["run_id"], {"offset": offset, "problem": None, "started": event["ts"],
+                                                "ended": None, "status": "incomplete", "sub_agents": 0, "results": 0})
+        kind = event["event"]
+        if kind == "run_start":
+            run["problem"] = event["problem"]
+        elif kind == "sub_agent":
+            run["sub_agents"] += 1
+        elif kind == "result":
+            run["results"] += 1
+        elif kind == "run_end":
+            run["status"] = event.get("status", "completed")
+            run["ended"] = event["ts"]
+        elif kind == "run_resume":
+            run["status"] = "incomplete"
+    index = {"journal_size": os.path.getsize(path) if os.path.exists(path) else 0, "runs": runs}
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    return index
+
+
+def load_index(path=JOURNAL_PATH, index_path=INDEX_PATH):
+    """Load the index, rebuilding it if the journal has changed since it was written."""
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if os.path.exists(path) and index.get("journal_size") == os.path.getsize(path):
+            return index
+    return build_index(path, index_path)
+
+
+def compact(path=JOURNAL_PATH, index_path=INDEX_PATH):
+    """Rewrite the journal with each run's events stored together and torn lines dropped, then re-index."""
+    runs = {}
+    for _, event in iter_events(path):
+        runs.setdefault(event["run_id"], []).append(event)
+    before = os.path.getsize(path) if os.path.exists(path) else 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for events in runs.values():
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    console.print(f"[green]Compacted {len(runs)} run(s): {before} -> {os.path.getsize(path)} bytes[/green]")
+    return build_index(path, index_path)
+
+
+def print_runs(runs, title):
+    table = Table(title=title, show_header=True, header_style="bold magenta")
+    table.add_column("Run ID", style="cyan")
+    table.add_column("Status", style="yellow")
+    table.add_column("Agents", justify="right")
+    table.add_column("Problem", style="green", max_width=60)
+    for run_id, run in runs:
+        table.add_row(run_id, run["status"], f"{run['results']}/{run['sub_agents']}", run["problem"] or "")
+    console.print(table)
+
+
+def search(terms, index):
+    """Runs whose problem text contains every term, most matches first."""
+    terms = [t.lower() for t in terms]
+    matches = []
+    for run_id, run in index["runs"].items():
+        problem = (run["problem"] or "").lower()
+        if all(t in problem for t in terms):
+            matches.append((sum(problem.count(t) for t in terms), run_id, run))
+    matches.sort(key=lambda m: (-m[0], -m[2]["started"]))
+    return [(run_id, run) for _, run_id, run in matches]
+
+
+def export(run_id, index, path=JOURNAL_PATH):
+    """A run in the format previously written to output.json."""
+    state = run_state(load_run(run_id, path, index["runs"]))
+    return {"problem": state["problem"], "sub_tasks": state["sub_tasks"], "plan": state["plan"],
+            "sub_agent_results": state["results"], "summarized_solution": state["summary"],
+            "summary_provider": state["summary_provider"], "status": state["status"]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query and maintain the Distributed Reasoning Agent run journal.")
+    parser.add_argument("--journal", default=JOURNAL_PATH)
+    parser.add_argument("--index", default=INDEX_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("compact", help="Group events by run, drop torn lines and rebuild the index.")
+    commands.add_parser("index", help="Rebuild the run index.")
+    commands.add_parser("list", help="List all runs.")
+    search_parser = commands.add_parser("search", help="Find runs by problem text.")
+    search_parser.add_argument("terms", nargs="+")
+    show_parser = commands.add_parser("show", help="Show the sub-agent results and summary of a run.")
+    show_parser.add_argument("run_id")
+    export_parser = commands.add_parser("export", help="Write a run as JSON (the former output.json format).")
+    export_parser.add_argument("run_id")
+    export_parser.add_argument("--output", default="output.json")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        compact(args.journal, args.index)
+    elif args.command == "index":
+        index = build_index(args.journal, args.index)
+        console.print(f"[green]Indexed {len(index['runs'])} run(s) in {args.index}[/green]")
+    else:
+        index = load_index(args.journal, args.index)
+        if args.command == "list":
+            print_runs(sorted(index["runs"].items(), key=lambda r: r[1]["started"]), "Journaled Runs")
+        elif args.command == "search":
+            print_runs(search(args.terms, index), f"Runs matching: {' '.join(args.terms)}")
+        elif args.run_id not in index["runs"]:
+            console.print(f"[red]Unknown run: {args.run_id}[/red]")
+        elif args.command == "show":
+            data = export(args.run_id, index, args.journal)
+            console.print(Panel(data["problem"] or "", title=f"[bold cyan]{args.run_id} ({data['status']})[/bold cyan]"))
+            for name, result in data["sub_agent_results"].items():
+                console.print(Panel(result, title=f"[bold green]Findings from {name}[/bold green]", border_style="green"))
+            if data["summarized_solution"]:
+                console.print(Panel(data["summarized_solution"], title="[bold cyan]🌟 Final Solution 🌟[/bold cyan]", border_style="green"))
+        elif args.command == "export":
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(export(args.run_id, index, args.journal), f, indent=4, ensure_ascii=False)
+            console.print(f"[bold cyan]✔ Run {args.run_id} exported to {args.output}[/bold cyan]")
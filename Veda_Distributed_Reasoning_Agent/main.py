@@ -1,8 +1,18 @@
-from agent import DistributedReasoningAgent
+import argparse
+from agent import DistributedReasoningAgent, SUMMARY_PROVIDERS
+from providers import ProviderRouter, build_providers
 
 if __name__ == "__main__":
-    user_input = input("Enter a problem statement: ")
-    agent = DistributedReasoningAgent()
-    sub_tasks = agent.generate_sub_tasks(user_input)
-    agent.create_sub_agents(sub_tasks)
-    agent.execute()
+    parser = argparse.ArgumentParser(description="Distributed Reasoning Agent")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume an interrupted run from the run journal.")
+    args = parser.parse_args()
+
+    with ProviderRouter(build_providers(SUMMARY_PROVIDERS.split(","))) as summary_router:
+        if args.resume:
+            agent = DistributedReasoningAgent.resume(args.resume, summary_router=summary_router)
+        else:
+            user_input = input("Enter a problem statement: ")
+            agent = DistributedReasoningAgent(summary_router=summary_router)
+            sub_tasks = agent.generate_sub_tasks(user_input)
+            agent.create_sub_agents(sub_tasks)
+        agent.execute()
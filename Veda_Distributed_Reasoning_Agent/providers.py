@@ -0,0 +1,268 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+# Provider SDKs are imported on first use, so starting the CLI only pays for the backends a run calls
+
+
+def chat_messages(system, user):
+    """LangChain system/human messages for a chat model call."""
+    from langchain.schema import SystemMessage, HumanMessage
+    return ([SystemMessage(content=system)] if system else []) + [HumanMessage(content=user)]
+
+
+class LazyChatGroq:
+    """ChatGroq model that is imported and constructed on its first invoke/ainvoke."""
+
+    def __init__(self, model="mixtral-8x7b-32768", api_key=None):
+        self.model = model
+        self.api_key = api_key
+        self._llm = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._llm is None:
+                from langchain_groq import ChatGroq
+                self._llm = ChatGroq(model_name=self.model, groq_api_key=self.api_key or os.getenv("GROQ_API_KEY"))
+        return self._llm
+
+    def invoke(self, messages):
+        return self.load().invoke(messages)
+
+    async def ainvoke(self, messages):
+        return await self.load().ainvoke(messages)
+
+
+class Provider:
+    """A named LLM backend that completes a system/user prompt pair."""
+    name = "provider"
+
+    def complete(self, system, user):
+        raise NotImplementedError
+
+
+class GroqProvider(Provider):
+    def __init__(self, model="mixtral-8x7b-32768", api_key=None):
+        self.name = f"groq:{model}"
+        self.llm = LazyChatGroq(model, api_key)
+
+    def complete(self, system, user):
+        return self.llm.invoke(chat_messages(system, user)).content
+
+
+class GeminiProvider(Provider):
+    def __init__(self, model="gemini-1.5-pro", api_key=None):
+        self.name = f"gemini:{model}"
+        self.model_name = model
+        self.api_key = api_key
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Import and configure the Gemini SDK on first use."""
+        with self._lock:
+            if self._model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key or os.getenv("GEMINI_API_KEY"))
+                self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def complete(self, system, user):
+        prompt = f"{system}\n\n{user}" if system else user
+        return self.load().generate_content(prompt).text
+
+
+class StubProvider(Provider):
+    """Local provider with configurable latency and failure rate, for offline testing."""
+
+    def __init__(self, name="stub", latency=0.2, jitter=0.0, fail_rate=0.0, response=None):
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.response = response
+
+    def complete(self, system, user):
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.fail_rate:
+            raise RuntimeError(f"{self.name}: simulated failure")
+        if self.response is not None:
+            return self.response
+        return f"{self.name}: summary of {len(user)} characters of findings."
+
+
+class ProviderStats:
+    """EWMA latency and error rate plus a window of recent latencies for one provider."""
+
+    def __init__(self, alpha=0.2, window=100):
+        self.alpha = alpha
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+        self.last_failure = 0.0
+        self.in_flight = 0
+
+    def record(self, seconds, ok):
+        self.calls += 1
+        if ok:
+            self.samples.append(seconds)
+            self.latency = seconds if self.latency is None else self.alpha * seconds + (1 - self.alpha) * self.latency
+        else:
+            self.failures += 1
+            self.last_failure = time.time()
+        self.error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.error_rate
+
+    def p95(self):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+class ProviderRouter:
+    """Routes each call to the fastest healthy provider and hedges slow calls with a backup request."""
+
+    def __init__(self, providers, alpha=0.2, max_error_rate=0.5, cooldown=30.0,
+                 hedge=True, min_hedge_delay=0.5, default_hedge_delay=10.0, min_samples=5):
+        if not providers:
+            raise ValueError("ProviderRouter needs at least one provider")
+        self.providers = list(providers)
+        self.stats = {p.name: ProviderStats(alpha) for p in self.providers}
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.hedge = hedge
+        self.min_hedge_delay = min_hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=2 * len(self.providers) + 2)
+        self.last_provider = None
+
+    def healthy(self, provider):
+        """A provider is healthy while its error EWMA is low, or once its cooldown has passed."""
+        stats = self.stats[provider.name]
+        return stats.error_rate <= self.max_error_rate or time.time() - stats.last_failure >= self.cooldown
+
+    def ranked(self):
+        """
+        Healthy providers by EWMA latency, then unhealthy ones. An unmeasured provider goes first to explore it,
+        unless its first call is still running: it may be the slow one, so it waits behind the measured providers.
+        """
+        with self.lock:
+            def key(p):
+                stats = self.stats[p.name]
+                if stats.latency is None:
+                    return (not self.healthy(p), 2 if stats.in_flight else 0, 0.0)
+                return (not self.healthy(p), 1, stats.latency)
+            return sorted(self.providers, key=key)
+
+    def hedge_delay(self, provider):
+        """Wait this long for a provider before issuing a backup request: its observed p95."""
+        with self.lock:
+            stats = self.stats[provider.name]
+            if len(stats.samples) < self.min_samples:
+                return self.default_hedge_delay
+            return max(self.min_hedge_delay, stats.p95())
+
+    def _call(self, provider, system, user):
+        stats = self.stats[provider.name]
+        with self.lock:
+            stats.in_flight += 1
+        start = time.time()
+        try:
+            result = provider.complete(system, user)
+        except Exception:
+            with self.lock:
+                stats.in_flight -= 1
+                stats.record(time.time() - start, ok=False)
+            raise
+        with self.lock:
+            stats.in_flight -= 1
+            stats.record(time.time() - start, ok=True)
+        return result
+
+    def complete(self, system, user):
+        """Complete a prompt on the best provider, hedging after its p95 and failing over on errors."""
+        candidates = self.ranked()
+        in_flight = {}
+        last_error = None
+
+        def launch():
+            provider = candidates.pop(0)
+            in_flight[self.executor.submit(self._call, provider, system, user)] = provider
+
+        launch()
+        while in_flight:
+            primary = next(iter(in_flight.values()))
+            timeout = self.hedge_delay(primary) if self.hedge and candidates and len(in_flight) == 1 else None
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                console.print(f"[dim]{primary.name} slower than p95 ({timeout:.1f}s); hedging with {candidates[0].name}[/dim]")
+                launch()
+                continue
+            for future in done:
+                provider = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    console.print(f"[yellow]Provider {provider.name} failed: {e}[/yellow]")
+                    continue
+                self.last_provider = provider.name
+                return result
+            if not in_flight and candidates:
+                launch()
+        raise RuntimeError(f"All providers failed: {last_error}")
+
+    def close(self):
+        """Shut down the worker threads; calls still running (e.g. the loser of a hedge) are not waited for."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def print_stats(self):
+        table = Table(title="Provider Routing", show_header=True, header_style="bold magenta")
+        table.add_column("Provider", style="cyan")
+        table.add_column("Calls", justify="right")
+        table.add_column("Failures", justify="right", style="red")
+        table.add_column("EWMA Latency", justify="right", style="green")
+        table.add_column("p95", justify="right", style="yellow")
+        table.add_column("EWMA Errors", justify="right")
+        with self.lock:
+            for provider in self.providers:
+                s = self.stats[provider.name]
+                p95 = s.p95()
+                table.add_row(provider.name, str(s.calls), str(s.failures),
+                              f"{s.latency:.2f}s" if s.latency is not None else "-",
+                              f"{p95:.2f}s" if p95 is not None else "-", f"{s.error_rate:.0%}")
+        console.print(table)
+
+
+def build_providers(names, groq_model="mixtral-8x7b-32768"):
+    """Build providers from names such as "gemini", "groq" or "stub"."""
+    factories = {
+        "gemini": lambda: GeminiProvider("gemini-1.5-pro"),
+        "groq": lambda: GroqProvider(groq_model),
+        "stub": lambda: StubProvider(),
+    }
+    providers = []
+    for name in names:
+        name = name.strip().lower()
+        if name not in factories:
+            raise ValueError(f"Unknown provider: {name}")
+        providers.append(factories[name]())
+    return providers
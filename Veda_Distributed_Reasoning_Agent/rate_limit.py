@@ -0,0 +1,56 @@
+import time
+import asyncio
+
+
+def estimate_tokens(text):
+    """Rough token count for a prompt (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Bucket holding up to `capacity` units, refilled continuously over one minute."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` units are available (0 if they already are)."""
+        self.refill()
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+class TokenBucketLimiter:
+    """Async limiter for a provider's requests-per-minute and tokens-per-minute quotas."""
+
+    def __init__(self, rpm=30, tpm=5000, completion_tokens=512):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.completion_tokens = completion_tokens
+        self.waited = 0.0
+        self.locks = {}  # One asyncio.Lock per event loop, so a later asyncio.run() (e.g. a resume) gets its own
+
+    async def acquire(self, prompt):
+        """Wait until one request and the prompt's estimated tokens (plus a completion budget) fit the quotas."""
+        lock = self.locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+        needed = estimate_tokens(prompt) + self.completion_tokens
+        # Callers queue on the lock, so requests are admitted in arrival order
+        async with lock:
+            while True:
+                delay = max(self.requests.wait_time(1), self.tokens.wait_time(needed))
+                if delay <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(needed)
+                    return
+                self.waited += delay
+                await asyncio.sleep(delay)
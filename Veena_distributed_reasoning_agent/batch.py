@@ -0,0 +1,141 @@
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rich.console import Console
+from rich.table import Table
+from sub_agent import SubAgent, configure_ollama_client
+from synthesis import synthesize_findings
+from response_cache import ResponseCache
+from main import load_config
+
+console = Console()
+
+def load_problems(filename: str) -> list:
+    """
+    Reads problem statements from a file: one JSON object with a "problem" key per line for .jsonl files,
+    otherwise one problem per non-empty line.
+    """
+    problems = []
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if filename.endswith(".jsonl"):
+                problems.append(json.loads(line)["problem"])
+            else:
+                problems.append(line)
+    return problems
+
+def percentile(values: list, pct: float) -> float:
+    """
+    Nearest-rank percentile of a list of numbers (0.0 for an empty list).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+class BatchRunner:
+    def __init__(self, config, concurrency: int = 4, cache: ResponseCache = None, synthesis_mode: str = "auto"):
+        """
+        Replays one sub-agent configuration against many problems.
+        'concurrency' bounds both the problems in flight and the in-flight Ollama requests.
+        """
+        self.config = config
+        self.concurrency = concurrency
+        self.cache = cache
+        self.synthesis_mode = synthesis_mode
+
+    def solve(self, index: int, problem: str) -> dict:
+        """
+        Runs every sub-agent and the synthesis for one problem and returns its record.
+        """
+        start = time.time()
+        record = {"index": index, "problem": problem, "results": [], "synthesis": None, "status": "completed", "error": None}
+        try:
+            for agent_def in self.config:
+                agent = SubAgent(
+                    name=agent_def.get("name"),
+                    task_type=agent_def.get("task_type"),
+                    task_prompt=agent_def.get("task_prompt")
+                )
+                record["results"].append({"agent_name": agent.name, "result": agent.execute(problem, cache=self.cache)})
+            record["synthesis"] = synthesize_findings(problem, record["results"], self.synthesis_mode)
+            empty = [r["agent_name"] for r in record["results"] if not r["result"]]
+            if empty or not record["synthesis"]:
+                record["status"] = "failed"
+                record["error"] = f"Empty response from: {', '.join(empty) or 'synthesis'}"
+        except Exception as e:
+            record["status"] = "failed"
+            record["error"] = str(e)
+        record["latency_seconds"] = round(time.time() - start, 3)
+        return record
+
+    def run(self, problems: list, output: str) -> dict:
+        """
+        Solves all problems concurrently, appending each record to the JSONL output as soon as it is done.
+        Returns throughput and latency statistics.
+        """
+        configure_ollama_client(pool_size=self.concurrency, max_concurrent_requests=self.concurrency)
+        latencies, failures = [], 0
+        start = time.time()
+        with open(output, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [executor.submit(self.solve, i, problem) for i, problem in enumerate(problems)]
+            for done, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                latencies.append(record["latency_seconds"])
+                if record["status"] == "failed":
+                    failures += 1
+                    console.print(f"[red]✘ [{done}/{len(problems)}] problem {record['index']}: {record['error']}[/red]")
+                else:
+                    console.print(f"[green]✔ [{done}/{len(problems)}] problem {record['index']} in {record['latency_seconds']:.1f}s[/green]")
+        elapsed = time.time() - start
+        return {
+            "problems": len(problems),
+            "failed": failures,
+            "elapsed_seconds": elapsed,
+            "problems_per_minute": len(problems) / elapsed * 60 if elapsed else 0.0,
+            "latency_mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "latency_max": max(latencies, default=0.0),
+        }
+
+def print_report(stats: dict):
+    """
+    Prints the end-of-batch throughput and latency summary.
+    """
+    table = Table(title="Batch Summary", show_header=True, header_style="bold magenta")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", style="green", justify="right")
+    table.add_row("Problems", str(stats["problems"]))
+    table.add_row("Failed", str(stats["failed"]))
+    table.add_row("Wall time", f"{stats['elapsed_seconds']:.1f}s")
+    table.add_row("Throughput", f"{stats['problems_per_minute']:.2f} problems/min")
+    table.add_row("Latency mean", f"{stats['latency_mean']:.1f}s")
+    table.add_row("Latency p50", f"{stats['latency_p50']:.1f}s")
+    table.add_row("Latency p95", f"{stats['latency_p95']:.1f}s")
+    table.add_row("Latency max", f"{stats['latency_max']:.1f}s")
+    console.print(table)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay one sub-agent configuration against many problems.")
+    parser.add_argument("--config", required=True, help="Sub-agent configuration file, e.g. config_agents_2.json.")
+    parser.add_argument("--problems", required=True, help="Text file (one problem per line) or .jsonl with a 'problem' key.")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file results are appended to.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Global limit on problems and Ollama requests in flight.")
+    parser.add_argument("--synthesis-mode", choices=["auto", "single", "hierarchical"], default="auto")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk sub-agent response cache.")
+    args = parser.parse_args()
+
+    problems = load_problems(args.problems)
+    console.rule(f"[bold green]BATCH REPLAY[/bold green] {args.config} x {len(problems)} problems")
+    runner = BatchRunner(load_config(args.config), concurrency=max(1, args.concurrency),
+                         cache=ResponseCache(bypass=args.no_cache), synthesis_mode=args.synthesis_mode)
+    print_report(runner.run(problems, args.output))
+    console.print(f"[green]Results written to {args.output}[/green]")
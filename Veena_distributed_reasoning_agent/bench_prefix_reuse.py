@@ -0,0 +1,65 @@
+import json
+import argparse
+from rich.console import Console
+from rich.table import Table
+from sub_agent import SubAgent, query_ollama
+from shared_context import SharedProblemContext
+from main import load_config
+
+console = Console()
+
+BASE_PROBLEM = (
+    "An automotive manufacturer faces unpredictable supplier lead times for critical components, "
+    "causing production stoppages, overtime costs and delayed customer deliveries across three plants. "
+)
+BENCH_OPTIONS = {"num_predict": 16, "temperature": 0}  # Short answers: the benchmark measures prefill
+
+def measure(agents, problem: str, model: str) -> dict:
+    """
+    Returns total prompt-evaluation (prefill) seconds for the agents with and without a shared context.
+    """
+    baseline = 0.0
+    for agent in agents:
+        stats = {}
+        query_ollama(agent.build_prompt(problem), model=model, options=BENCH_OPTIONS, stats=stats)
+        baseline += stats.get("prompt_eval_duration", 0) / 1e9
+
+    shared = SharedProblemContext(problem, model=model)
+    shared.prime()
+    reused = shared.prefill_seconds
+    for agent in agents:
+        stats = {}
+        shared.run(agent.name, agent.task_type, agent.task_prompt, options=BENCH_OPTIONS, stats=stats)
+        reused += stats.get("prompt_eval_duration", 0) / 1e9
+    return {"problem_tokens": shared.prefix_tokens, "baseline_prefill_seconds": baseline,
+            "shared_prefill_seconds": reused}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure prefill time saved by sharing the problem context.")
+    parser.add_argument("--config", default="config_agents_2.json", help="Sub-agent configuration to benchmark.")
+    parser.add_argument("--model", default="llama3")
+    parser.add_argument("--sizes", default="1,4,16,48", help="Comma-separated repetitions of the base problem text.")
+    parser.add_argument("--output", help="Optional JSON file for the raw measurements.")
+    args = parser.parse_args()
+
+    agents = [SubAgent(d.get("name"), d.get("task_type"), d.get("task_prompt")) for d in load_config(args.config)]
+    rows = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        result = measure(agents, BASE_PROBLEM * size, args.model)
+        result["repetitions"] = size
+        rows.append(result)
+
+    table = Table(title=f"Shared Context Prefill ({len(agents)} agents, {args.model})", show_header=True,
+                  header_style="bold magenta")
+    table.add_column("Problem Tokens", justify="right", style="cyan")
+    table.add_column("Full Prompts", justify="right", style="yellow")
+    table.add_column("Shared Context", justify="right", style="green")
+    table.add_column("Saved", justify="right", style="bold")
+    for row in rows:
+        baseline, shared = row["baseline_prefill_seconds"], row["shared_prefill_seconds"]
+        saved = (1 - shared / baseline) if baseline else 0.0
+        table.add_row(str(row["problem_tokens"]), f"{baseline:.2f}s", f"{shared:.2f}s", f"{saved:.0%}")
+    console.print(table)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
@@ -0,0 +1,190 @@
+import re
+import time
+import threading
+from rich.console import Console
+from rich.table import Table
+from sub_agent import query_ollama
+
+console = Console()
+
+CONFIDENCE_INSTRUCTION = """
+On the last line, rate your confidence in this answer as "Confidence: <0-100>".
+"""
+
+CONFIDENCE_PATTERN = re.compile(r"confidence\s*[:=]\s*(\d{1,3})\s*%?", re.IGNORECASE)
+REFUSAL_PATTERN = re.compile(
+    r"\b(I can(?:not|'t) (?:help|assist|provide)|I(?: am|'m) (?:unable|not able) to|as an AI\b|"
+    r"I (?:do not|don't) have (?:enough|access|sufficient))",
+    re.IGNORECASE,
+)
+
+def split_confidence(output: str):
+    """
+    Removes the self-reported confidence line from an answer.
+    Returns (answer, confidence) where confidence is None if the model did not report one.
+    """
+    matches = list(CONFIDENCE_PATTERN.finditer(output))
+    if not matches:
+        return output.strip(), None
+    last = matches[-1]
+    answer = (output[:last.start()] + output[last.end():]).strip()
+    return answer, min(int(last.group(1)), 100)
+
+class ConfidenceFilter:
+    """
+    Wraps an on_token callback so the self-reported confidence rating is never streamed.
+    Chunks are forwarded line by line: the current line is held back until it is complete.
+    """
+    def __init__(self, on_token):
+        self.on_token = on_token
+        self.pending = ""
+
+    def __call__(self, chunk: str):
+        self.pending += chunk
+        *lines, self.pending = self.pending.split("\n")
+        for line in lines:
+            self._emit(line + "\n")
+
+    def flush(self):
+        """
+        Forwards the last, unterminated line once the stream has ended.
+        """
+        if self.pending:
+            self._emit(self.pending)
+            self.pending = ""
+
+    def _emit(self, text: str):
+        stripped = CONFIDENCE_PATTERN.sub("", text)
+        if stripped != text and not stripped.strip():
+            return
+        self.on_token(stripped)
+
+class ModelCascade:
+    def __init__(self, small_model: str = "llama3.2:1b", large_model: str = "llama3",
+                 min_length: int = 80, min_confidence: int = 60, required_keys=None):
+        """
+        Runs each prompt on a small fast model first and escalates to the large model
+        only when the small model's answer fails the cheap validators.
+        'required_keys' are terms that must all appear in an acceptable answer.
+        """
+        self.small_model = small_model
+        self.large_model = large_model
+        self.min_length = min_length
+        self.min_confidence = min_confidence
+        self.required_keys = list(required_keys or [])
+        self.stats = CascadeStats()
+
+    def describe(self) -> str:
+        """
+        Returns a short identifier of the cascade, e.g. "llama3.2:1b->llama3".
+        """
+        return f"{self.small_model}->{self.large_model}"
+
+    def validate(self, answer: str, confidence) -> list:
+        """
+        Returns the reasons an answer should be escalated (empty list when it is acceptable).
+        """
+        failures = []
+        if len(answer) < self.min_length:
+            failures.append("too short")
+        if REFUSAL_PATTERN.search(answer):
+            failures.append("refusal")
+        missing = [key for key in self.required_keys if key.lower() not in answer.lower()]
+        if missing:
+            failures.append(f"missing {', '.join(missing)}")
+        if confidence is None:
+            failures.append("no confidence reported")
+        elif confidence < self.min_confidence:
+            failures.append(f"low confidence ({confidence})")
+        return failures
+
+    def run(self, prompt: str, name: str = "", options: dict = None, on_token=None) -> str:
+        """
+        Executes a prompt through the cascade and returns the accepted answer, without the confidence line.
+        'on_token' receives streamed chunks from both attempts, separated by an escalation marker;
+        both answers are streamed line by line so that a confidence line can be left out.
+        """
+        stream = ConfidenceFilter(on_token) if on_token is not None else None
+        start = time.time()
+        output = query_ollama(prompt + CONFIDENCE_INSTRUCTION, model=self.small_model, options=options,
+                              on_token=stream)
+        if stream is not None:
+            stream.flush()
+        small_seconds = time.time() - start
+        answer, confidence = split_confidence(output)
+        failures = self.validate(answer, confidence)
+        if not failures:
+            self.stats.record(small_seconds, None)
+            return answer
+
+        console.print(f"[yellow]{name or 'Task'}: escalating to {self.large_model} ({'; '.join(failures)})[/yellow]")
+        if on_token is not None:
+            on_token(f"\n--- escalated to {self.large_model} ---\n")
+        start = time.time()
+        stream = ConfidenceFilter(on_token) if on_token is not None else None
+        output = query_ollama(prompt, model=self.large_model, options=options, on_token=stream)
+        if stream is not None:
+            stream.flush()
+        self.stats.record(small_seconds, time.time() - start)
+        return split_confidence(output)[0]
+
+    def print_stats(self):
+        """
+        Prints escalation rate and latency compared with running everything on the large model.
+        """
+        summary = self.stats.summary()
+        table = Table(title=f"Model Cascade ({self.describe()})", show_header=True, header_style="bold magenta")
+        table.add_column("Metric", style="cyan")
+        table.add_column("Value", style="green")
+        table.add_row("Tasks", str(summary["tasks"]))
+        table.add_row("Escalated", f"{summary['escalations']} ({summary['escalation_rate']:.0%})")
+        table.add_row("Cascade latency", f"{summary['cascade_seconds']:.1f}s")
+        if summary["large_only_seconds"] is None:
+            table.add_row("Large-model-only latency", "n/a (no large-model calls to measure)")
+        else:
+            table.add_row("Large-model-only latency (est.)", f"{summary['large_only_seconds']:.1f}s")
+            table.add_row("Latency saved (est.)", f"{summary['saved_seconds']:.1f}s")
+        console.print(table)
+
+class CascadeStats:
+    """
+    Thread-safe per-run counters for a ModelCascade.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tasks = 0
+        self.escalations = 0
+        self.small_seconds = 0.0
+        self.large_seconds = 0.0
+
+    def record(self, small_seconds: float, large_seconds):
+        """
+        Records one task; large_seconds is None when the small model's answer was accepted.
+        """
+        with self.lock:
+            self.tasks += 1
+            self.small_seconds += small_seconds
+            if large_seconds is not None:
+                self.escalations += 1
+                self.large_seconds += large_seconds
+
+    def summary(self) -> dict:
+        """
+        Returns the counters plus the estimated latency of sending every task to the large model,
+        extrapolated from the average latency of the escalated calls.
+        """
+        with self.lock:
+            cascade_seconds = self.small_seconds + self.large_seconds
+            large_only = None
+            saved = None
+            if self.escalations:
+                large_only = self.large_seconds / self.escalations * self.tasks
+                saved = large_only - cascade_seconds
+            return {
+                "tasks": self.tasks,
+                "escalations": self.escalations,
+                "escalation_rate": self.escalations / self.tasks if self.tasks else 0.0,
+                "cascade_seconds": cascade_seconds,
+                "large_only_seconds": large_only,
+                "saved_seconds": saved,
+            }
@@ -0,0 +1,73 @@
+import json
+
+TASK_KEYS = ("agent_name", "task_summary", "task_prompt")
+
+def task_schema(num_agents: int) -> dict:
+    """
+    JSON schema passed as Ollama's structured-output 'format' for problem decomposition.
+    """
+    return {
+        "type": "object",
+        "properties": {
+            "tasks": {
+                "type": "array",
+                "minItems": num_agents,
+                "maxItems": num_agents,
+                "items": {
+                    "type": "object",
+                    "properties": {key: {"type": "string"} for key in TASK_KEYS},
+                    "required": list(TASK_KEYS),
+                },
+            }
+        },
+        "required": ["tasks"],
+    }
+
+def is_valid_task(task) -> bool:
+    """
+    True if the task is an object with a non-empty string for every required key.
+    """
+    return isinstance(task, dict) and all(isinstance(task.get(key), str) and task[key].strip() for key in TASK_KEYS)
+
+class IncrementalTaskParser:
+    """
+    Consumes streamed JSON of the form {"tasks": [{...}, {...}]} and returns each task object
+    as soon as its closing brace arrives, without waiting for the rest of the response.
+    """
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.current = []   # Characters of the task object being read
+
+    def feed(self, chunk: str) -> list:
+        """
+        Adds a chunk of streamed text and returns the task objects it completed.
+        """
+        completed = []
+        for char in chunk:
+            if self.depth >= 3:
+                self.current.append(char)
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                if self.depth == 3 and char == "{":
+                    self.current = [char]
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 2 and char == "}":
+                    try:
+                        completed.append(json.loads("".join(self.current), strict=False))
+                    except ValueError:
+                        pass
+                    self.current = []
+        return completed
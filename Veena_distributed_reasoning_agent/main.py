@@ -1,13 +1,25 @@
-import re
 import requests
 import json
 import os
 import glob
+import argparse
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.table import Table
 from rich.panel import Panel
+from rich.live import Live
 from sub_agent import SubAgent, query_ollama
+from synthesis import synthesize_findings
+from cascade import ModelCascade
+from streaming import LiveAgentBoard, execute_agents_live, MAX_PARALLEL_AGENTS
+from response_cache import ResponseCache
+from shared_context import SharedProblemContext
+from decomposition import IncrementalTaskParser, is_valid_task, task_schema
+
+# Hierarchical synthesis keeps every prompt bounded, so large agent counts are practical.
+MAX_AGENTS = 50
 
 console = Console()
 
@@ -54,20 +66,42 @@ def load_config(filename):
 # Scenario 1: Generate New Configuration
 # ---------------------------
 class MainAgent:
-    def __init__(self, problem: str, num_agents: int):
+    def __init__(self, problem: str, num_agents: int, synthesis_mode: str = "auto", cascade: ModelCascade = None,
+                 stream: bool = False, cache: ResponseCache = None, share_context: bool = False,
+                 pipelined: bool = False, save_lock=None):
         """
         Initializes the MainAgent with the problem statement and desired number of sub-agents.
+        synthesis_mode is "auto", "single" or "hierarchical" (see synthesis.synthesize_findings).
+        If a ModelCascade is given, sub-agent tasks run small-model-first with validation-driven escalation.
+        With stream=True, sub-agents run concurrently and their answers render live as tokens arrive.
+        If a ResponseCache is given, sub-agent answers are reused across runs.
+        With share_context=True, the problem statement is prefilled once and every sub-agent
+        continues from that Ollama context (ignored in cascade mode, where models differ).
+        With pipelined=True, each sub-agent starts executing as soon as its task streams out of decomposition.
+        If a save_lock is given, it is held while the run instance counter and config file are updated,
+        so concurrent runs (e.g. jobs on the server) never write the same config file.
         """
         self.problem = problem
         self.num_agents = num_agents
+        self.pipelined = pipelined
+        self.save_lock = save_lock
+        self.synthesis_mode = synthesis_mode
+        self.cascade = cascade
+        self.stream = stream
+        self.cache = cache
+        self.share_context = share_context
         self.tasks = []       # Will hold decomposed tasks (list of dictionaries)
         self.sub_agents = []  # Will hold the created SubAgent instances
         self.results = []     # Will store output from each sub-agent
+        self.synthesis = None # Final integrated plan, set by synthesize_results
 
-    def decompose_problem(self):
+    def decompose_problem(self, on_task=None):
         """
         Uses the LLM to decompose the problem into exactly num_agents tasks.
         Each task is a JSON object with keys: 'agent_name', 'task_summary', and 'task_prompt'.
+        The response is constrained by a JSON schema and parsed while it streams; 'on_task' is called
+        with each task as soon as it is complete. A single repair call is made only if the response
+        does not yield enough valid tasks, and a ValueError is raised if none can be recovered.
         """
         prompt = f"""Decompose the following complex problem into exactly {self.num_agents} tasks.
 Each task must be a JSON object with the following keys:
@@ -78,20 +112,59 @@ Each task must be a JSON object with the following keys:
 Problem:
 {self.problem}
 
-Respond with a JSON array containing exactly {self.num_agents} objects.
+Respond with a JSON object whose "tasks" array contains exactly {self.num_agents} objects.
+"""
+        schema = task_schema(self.num_agents)
+        parser = IncrementalTaskParser()
+
+        def accept(task):
+            names = {t["agent_name"] for t in self.tasks}
+            if is_valid_task(task) and task["agent_name"] not in names and len(self.tasks) < self.num_agents:
+                self.tasks.append(task)
+                if on_task is not None:
+                    on_task(task)
+
+        def on_token(chunk):
+            for task in parser.feed(chunk):
+                accept(task)
+
+        response = query_ollama(prompt, format=schema, on_token=on_token)
+        if len(self.tasks) < self.num_agents:
+            console.print(f"[yellow]Decomposition returned {len(self.tasks)}/{self.num_agents} valid tasks; "
+                          f"requesting a repair.[/yellow]")
+            for task in self.repair_decomposition(response, schema):
+                accept(task)
+        if not self.tasks:
+            console.print("[red]Error during problem decomposition: no valid tasks could be recovered.[/red]")
+            raise ValueError("Problem decomposition produced no valid tasks")
+        console.print("[green]Decomposition successful:[/green]")
+        console.print_json(json.dumps(self.tasks, indent=2))
+
+    def repair_decomposition(self, response: str, schema: dict) -> list:
+        """
+        Asks the LLM once to fix an invalid or incomplete decomposition and returns the repaired tasks.
+        """
+        valid = json.dumps(self.tasks, indent=2)
+        prompt = f"""The following decomposition of a problem into exactly {self.num_agents} tasks is invalid or incomplete.
+Each task needs non-empty "agent_name", "task_summary" and "task_prompt" strings, and agent names must be unique.
+Keep the valid tasks listed below, fix or complete the rest, and return exactly {self.num_agents} tasks.
+
+Problem:
+{self.problem}
+
+Valid tasks so far:
+{valid}
+
+Original response:
+{response}
 """
-        response = query_ollama(prompt)
+        repaired = query_ollama(prompt, format=schema)
         try:
-            # Extract the JSON array from the response.
-            json_str = re.search(r'\[.*\]', response, re.DOTALL).group()
-            # Remove unwanted control characters.
-            json_str = re.sub(r'[\x00-\x1f]+', ' ', json_str)
-            tasks = json.loads(json_str)
-            self.tasks = tasks[:self.num_agents]
-            console.print("[green]Decomposition successful:[/green]")
-            console.print_json(json.dumps(self.tasks, indent=2))
-        except Exception as e:
-            console.print(f"[red]Error during problem decomposition: {e}[/red]")
+            tasks = json.loads(repaired, strict=False).get("tasks", [])
+        except (ValueError, AttributeError) as e:
+            console.print(f"[red]Repair response was not valid JSON: {e}[/red]")
+            return []
+        return tasks if isinstance(tasks, list) else []
 
     def create_sub_agents(self):
         """
@@ -114,13 +187,74 @@ Respond with a JSON array containing exactly {self.num_agents} objects.
             table.add_row(agent.name, agent.task_type, agent.task_prompt)
         console.print(table)
 
+    def decompose_and_execute(self):
+        """
+        Pipelined alternative to decompose_problem, create_sub_agents and execute_sub_agents:
+        each sub-agent is created and submitted for execution as soon as its task object is complete.
+        Honours stream (a live panel is added per agent as its task arrives) and share_context like execute_sub_agents.
+        """
+        pending = []
+        shared_context = None
+        if self.share_context and self.cascade is None:
+            shared_context = SharedProblemContext(self.problem)
+        board = LiveAgentBoard([]) if self.stream else None
+
+        def run(agent):
+            if board is None:
+                console.print(f"[blue]Executing {agent.name}...[/blue]")
+                return agent.execute(self.problem, cascade=self.cascade, cache=self.cache, shared_context=shared_context)
+            board.start(agent.name)
+            try:
+                result = agent.execute(self.problem, cascade=self.cascade, on_token=board.token_callback(agent.name),
+                                       cache=self.cache, shared_context=shared_context)
+            except Exception:
+                board.finish(agent.name, "failed")
+                raise
+            board.finish(agent.name, "done" if result else "failed")
+            return result
+
+        live = Live(board, console=console, refresh_per_second=8, vertical_overflow="visible") if board is not None else nullcontext()
+        with live, ThreadPoolExecutor(max_workers=MAX_PARALLEL_AGENTS) as executor:
+            def start(task):
+                agent = SubAgent(
+                    name=task.get("agent_name"),
+                    task_type=task.get("task_summary"),
+                    task_prompt=task.get("task_prompt")
+                )
+                if board is not None:
+                    board.add(agent.name)
+                pending.append((agent, executor.submit(run, agent)))
+
+            self.decompose_problem(on_task=start)
+            for agent, future in pending:
+                result = future.result()
+                self.sub_agents.append(agent)
+                self.results.append({"agent_name": agent.name, "result": result})
+                if board is None:
+                    panel = Panel(
+                        f"[bold]{agent.name} Output:[/bold]\n{result}",
+                        title=agent.name,
+                        border_style="dim"
+                    )
+                    console.print(panel)
+        if board is not None:
+            console.print(board.stats_table())
+
     def execute_sub_agents(self):
         """
         Executes the task for each sub-agent and collects their output.
         """
+        shared_context = None
+        if self.share_context and self.cascade is None:
+            shared_context = SharedProblemContext(self.problem)
+        if self.stream:
+            self.results.extend(execute_agents_live(self.sub_agents, self.problem, cascade=self.cascade,
+                                                    cache=self.cache, shared_context=shared_context))
+            return
         for agent in self.sub_agents:
             console.print(f"[blue]Executing {agent.name}...[/blue]")
-            result = agent.execute(self.problem)
+            result = agent.execute(self.problem, cascade=self.cascade, cache=self.cache,
+                                   shared_context=shared_context)
             self.results.append({"agent_name": agent.name, "result": result})
             panel = Panel(
                 f"[bold]{agent.name} Output:[/bold]\n{result}",
@@ -132,24 +266,12 @@ Respond with a JSON array containing exactly {self.num_agents} objects.
     def synthesize_results(self):
         """
         Synthesizes all sub-agent outputs into a final integrated plan.
+        Large result sets are map-reduced first (see synthesis.py) so no prompt overflows the context.
         """
-        synthesis_prompt = f"""Using the following findings from expert agents, synthesize a cohesive plan to solve the problem.
-Problem:
-{self.problem}
-
-Agent Findings:
-{json.dumps(self.results, indent=2)}
-
-Your synthesis should include:
-1. A Problem Overview
-2. Key Findings from each agent
-3. Proposed Solutions
-4. Recommended Action Items
-
-Provide your answer in clear, concise bullet points.
-"""
-        synthesis = query_ollama(synthesis_prompt)
+        synthesis = synthesize_findings(self.problem, self.results, self.synthesis_mode)
+        self.synthesis = synthesis
         console.print(Markdown(f"# Final Integrated Plan\n{synthesis}"))
+        return synthesis
 
     def save_config(self, run_instance: int):
         """
@@ -173,27 +295,42 @@ Provide your answer in clear, concise bullet points.
           6. Updates the run instance counter.
         """
         console.rule(f"[bold]Problem:[/bold] {self.problem}")
-        self.decompose_problem()
-        self.create_sub_agents()
-        self.execute_sub_agents()
+        if self.pipelined:
+            self.decompose_and_execute()
+        else:
+            self.decompose_problem()
+            self.create_sub_agents()
+            self.execute_sub_agents()
         self.synthesize_results()
-        run_instance = get_run_instance()
-        self.save_config(run_instance)
-        update_run_instance(run_instance + 1)
+        if self.cascade is not None:
+            self.cascade.print_stats()
+        if self.cache is not None:
+            self.cache.print_stats()
+        with self.save_lock or nullcontext():
+            run_instance = get_run_instance()
+            self.save_config(run_instance)
+            update_run_instance(run_instance + 1)
 
 # ---------------------------
 # Scenario 2: Use Existing Configuration
 # ---------------------------
 class MainAgentScenario2:
-    def __init__(self, problem: str, config):
+    def __init__(self, problem: str, config, synthesis_mode: str = "auto", cascade: ModelCascade = None,
+                 stream: bool = False, cache: ResponseCache = None, share_context: bool = False):
         """
         Initializes the MainAgent for Scenario 2 with a new problem statement and a loaded configuration.
         'config' is expected to be a list of sub-agent definitions.
         """
         self.problem = problem
         self.config = config
+        self.synthesis_mode = synthesis_mode
+        self.cascade = cascade
+        self.stream = stream
+        self.cache = cache
+        self.share_context = share_context
         self.sub_agents = []  # Will store SubAgent objects.
         self.results = []     # Will collect outputs from each sub-agent.
+        self.synthesis = None # Final integrated plan, set by synthesize_results.
 
     def create_sub_agents_from_config(self):
         """
@@ -219,9 +356,17 @@ class MainAgentScenario2:
         """
         Executes each sub-agent's task and collects their outputs.
         """
+        shared_context = None
+        if self.share_context and self.cascade is None:
+            shared_context = SharedProblemContext(self.problem)
+        if self.stream:
+            self.results.extend(execute_agents_live(self.sub_agents, self.problem, cascade=self.cascade,
+                                                    cache=self.cache, shared_context=shared_context))
+            return
         for agent in self.sub_agents:
             console.print(f"[blue]Executing {agent.name}...[/blue]")
-            result = agent.execute(self.problem)
+            result = agent.execute(self.problem, cascade=self.cascade, cache=self.cache,
+                                   shared_context=shared_context)
             self.results.append({"agent_name": agent.name, "result": result})
             panel = Panel(
                 f"[bold]{agent.name} Output:[/bold]\n{result}",
@@ -233,24 +378,12 @@ class MainAgentScenario2:
     def synthesize_results(self):
         """
         Synthesizes the outputs from all sub-agents into a final integrated plan.
+        Large result sets are map-reduced first (see synthesis.py) so no prompt overflows the context.
         """
-        synthesis_prompt = f"""Using the following findings from expert agents, synthesize a cohesive plan to solve the problem.
-Problem:
-{self.problem}
-
-Agent Findings:
-{json.dumps(self.results, indent=2)}
-
-Your synthesis should include:
-1. A Problem Overview
-2. Key Findings from each agent
-3. Proposed Solutions
-4. Recommended Action Items
-
-Provide your answer in clear, concise bullet points.
-"""
-        synthesis = query_ollama(synthesis_prompt)
+        synthesis = synthesize_findings(self.problem, self.results, self.synthesis_mode)
+        self.synthesis = synthesis
         console.print(Markdown(f"# Final Integrated Plan\n{synthesis}"))
+        return synthesis
 
     def run(self):
         """
@@ -263,11 +396,37 @@ Provide your answer in clear, concise bullet points.
         self.create_sub_agents_from_config()
         self.execute_sub_agents()
         self.synthesize_results()
+        if self.cascade is not None:
+            self.cascade.print_stats()
+        if self.cache is not None:
+            self.cache.print_stats()
 
 # ---------------------------
 # Main Program: Choose Scenario
 # ---------------------------
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed Reasoning Agent")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Run sub-agent tasks on a small model first and escalate failures to the large model.")
+    parser.add_argument("--small-model", default="llama3.2:1b", help="Small model used first in cascade mode.")
+    parser.add_argument("--large-model", default="llama3", help="Model used for escalations in cascade mode.")
+    parser.add_argument("--required-keys", default="",
+                        help="Comma-separated terms every small-model answer must contain in cascade mode.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Run sub-agents concurrently and stream their answers live.")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk sub-agent response cache.")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="Ignore cached sub-agent responses but store the new ones.")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Scenario 1: start each sub-agent as soon as its task streams out of decomposition.")
+    parser.add_argument("--shared-context", action="store_true",
+                        help="Prefill the problem statement once and reuse it for every sub-agent.")
+    parser.add_argument("--cache-ttl", type=float, default=None, help="Ignore cached responses older than this many seconds.")
+    args = parser.parse_args()
+    required_keys = [key.strip() for key in args.required_keys.split(",") if key.strip()]
+    cascade = ModelCascade(args.small_model, args.large_model, required_keys=required_keys) if args.cascade else None
+    cache = ResponseCache(ttl=args.cache_ttl, bypass=args.no_cache, refresh=args.refresh_cache)
+
     console.rule("[bold green]DISTRIBUTED REASONING AGENT[/bold green]")
     # First, ask for the complex problem statement.
     problem = input("Enter complex problem statement:\n> ").strip()
@@ -277,13 +436,14 @@ if __name__ == "__main__":
     
     if mode == "1":
         # Scenario 1: Generate new configuration.
-        num_input = input("How many sub-agents do you want? (Max 5): ").strip()
+        num_input = input(f"How many sub-agents do you want? (Max {MAX_AGENTS}): ").strip()
         try:
             num_agents = int(num_input)
-            num_agents = max(1, min(num_agents, 5))
+            num_agents = max(1, min(num_agents, MAX_AGENTS))
         except:
             num_agents = 3
-        main_agent = MainAgent(problem, num_agents)
+        main_agent = MainAgent(problem, num_agents, cascade=cascade, stream=args.stream, cache=cache,
+                               share_context=args.shared_context, pipelined=args.pipelined)
         main_agent.run()
     elif mode == "2":
         # Scenario 2: Use existing configuration.
@@ -302,7 +462,8 @@ if __name__ == "__main__":
             console.print(f"[red]Invalid selection: {e}[/red]")
             exit(1)
         config = load_config(chosen_config_file)
-        main_agent = MainAgentScenario2(problem, config)
+        main_agent = MainAgentScenario2(problem, config, cascade=cascade, stream=args.stream, cache=cache,
+                                        share_context=args.shared_context)
         main_agent.run()
     else:
         console.print("[red]Invalid option. Please run the program again and choose either 1 or 2.[/red]")
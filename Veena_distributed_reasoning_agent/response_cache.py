@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "subagent_responses.db")
+
+class ResponseCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 2000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = None, bypass: bool = False, refresh: bool = False):
+        """
+        Persistent cache of sub-agent responses backed by SQLite.
+        Entries are evicted least-recently-used once either max_entries or max_bytes is exceeded,
+        and ignored once older than ttl seconds (if set).
+        bypass skips the cache entirely; refresh ignores stored entries but stores new responses.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bypass = bypass
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = None
+        if not bypass:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            with self.conn:
+                self.conn.execute(
+                    """CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        response TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        created REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )"""
+                )
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)")
+
+    @staticmethod
+    def make_key(model: str, agent: dict, problem: str, options: dict = None) -> str:
+        """
+        Hashes everything that determines a sub-agent's answer: the model, the agent definition
+        (name, task_type, task_prompt), the problem and the generation options.
+        """
+        material = json.dumps([model, agent, problem, options or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """
+        Returns the cached response for key, or None on a miss.
+        """
+        if self.bypass:
+            return None
+        with self.lock:
+            row = None
+            if not self.refresh:
+                row = self.conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and time.time() - row[1] > self.ttl:
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self.conn:
+                self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """
+        Stores a response and evicts least-recently-used entries beyond the size bounds.
+        """
+        if self.bypass or not response:
+            return
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode("utf-8")), now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = self.conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        stale = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            stale.append((key,))
+            count -= 1
+            total -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def print_stats(self):
+        """
+        Prints hit/miss counts for this run.
+        """
+        if self.bypass:
+            return
+        table = Table(title="Response Cache", show_header=True, header_style="bold magenta")
+        table.add_column("Hits", style="green", justify="right")
+        table.add_column("Misses", style="yellow", justify="right")
+        table.add_column("Hit Rate", style="cyan", justify="right")
+        table.add_row(str(self.hits), str(self.misses), f"{self.hit_rate:.0%}")
+        console.print(table)
@@ -0,0 +1,375 @@
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from rich.console import Console
+from main import (
+    MAX_AGENTS,
+    MainAgent,
+    MainAgentScenario2,
+    list_config_files,
+    load_config,
+)
+from response_cache import ResponseCache
+
+console = Console()
+
+# Fields every sub-agent definition of a Scenario 2 config must have (see SubAgent.to_dict)
+AGENT_FIELDS = ("name", "task_type", "task_prompt")
+
+# ---------------------------
+# Persistent Job Queue
+# ---------------------------
+class JobStore:
+    """
+    Persists submitted jobs in a SQLite database so queued work survives a server restart.
+    """
+    def __init__(self, path: str = "jobs.db"):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    problem TEXT NOT NULL,
+                    num_agents INTEGER,
+                    config TEXT,
+                    results TEXT,
+                    synthesis TEXT,
+                    error TEXT,
+                    created REAL,
+                    started REAL,
+                    finished REAL
+                )"""
+            )
+
+    def add(self, job: dict):
+        """
+        Inserts a new job record.
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (id, status, mode, problem, num_agents, config, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job["id"], job["status"], job["mode"], job["problem"], job.get("num_agents"),
+                 json.dumps(job.get("config")), job["created"])
+            )
+
+    def update(self, job_id: str, **fields):
+        """
+        Updates the given columns of a job. 'results' is stored as JSON.
+        """
+        if "results" in fields:
+            fields["results"] = json.dumps(fields["results"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self.lock, self.conn:
+            self.conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str):
+        """
+        Returns the job as a dictionary, or None if it does not exist.
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["config"] = json.loads(job["config"]) if job["config"] else None
+        job["results"] = json.loads(job["results"]) if job["results"] else []
+        return job
+
+    def unfinished(self):
+        """
+        Returns the ids of jobs that were queued or running when the server last stopped, oldest first.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created"
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+# ---------------------------
+# Worker Pool
+# ---------------------------
+class JobService:
+    def __init__(self, store: JobStore, workers: int = 2, max_queue: int = 32, cache: ResponseCache = None):
+        """
+        Runs submitted jobs on a fixed number of worker threads fed from a bounded queue.
+        An optional ResponseCache is shared by all jobs.
+        """
+        self.store = store
+        self.cache = cache
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.active = {}        # job_id -> running agent, used to stream partial results
+        self.lock = threading.Lock()
+        self.submit_lock = threading.Lock()  # Makes the capacity check, insert and enqueue one step
+        self.config_lock = threading.Lock()  # Serializes run_instance.txt / config file updates
+        self.busy = 0
+        self.busy_seconds = 0.0
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self.started = time.time()
+
+    def start(self):
+        """
+        Re-queues jobs left over from a previous process and starts the worker threads.
+        """
+        for job_id in self.store.unfinished():
+            self.store.update(job_id, status="queued", started=None)
+            with self.queue.mutex:
+                self.queue.queue.append(job_id)  # Recovered jobs bypass the size bound
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"job-worker-{i + 1}", daemon=True).start()
+        console.print(f"[green]Started {self.workers} workers ({self.queue.qsize()} recovered jobs queued)[/green]")
+
+    def submit(self, payload: dict) -> dict:
+        """
+        Validates a job request, persists it and places it on the queue.
+        Raises ValueError for bad input and queue.Full when the queue is at capacity.
+        """
+        problem = str(payload.get("problem", "")).strip()
+        if not problem:
+            raise ValueError("'problem' is required")
+        job = {"id": uuid.uuid4().hex, "status": "queued", "problem": problem, "created": time.time()}
+        if payload.get("config") is not None or payload.get("config_file"):
+            job["mode"] = "existing_config"
+            job["config"] = self._resolve_config(payload)
+        else:
+            job["mode"] = "new_config"
+            try:
+                num_agents = int(payload.get("num_agents", 3))
+            except (TypeError, ValueError):
+                raise ValueError("'num_agents' must be an integer")
+            job["num_agents"] = max(1, min(num_agents, MAX_AGENTS))
+        with self.submit_lock:
+            # Workers only take from the queue, so it cannot fill up between this check and put_nowait;
+            # a rejected job is never stored, and restart recovery cannot run it
+            if self.queue.full():
+                with self.lock:
+                    self.counters["rejected"] += 1
+                raise queue.Full
+            self.store.add(job)
+            self.queue.put_nowait(job["id"])
+        with self.lock:
+            self.counters["submitted"] += 1
+        return self.store.get(job["id"])
+
+    def _resolve_config(self, payload: dict):
+        """
+        Returns the sub-agent configuration for a Scenario 2 job, either inline or from a known config file.
+        """
+        if payload.get("config") is not None:
+            config = payload["config"]
+        else:
+            config_file = payload["config_file"]
+            if config_file not in list_config_files():
+                raise ValueError(f"Unknown config file: {config_file}")
+            config = load_config(config_file)
+        if not isinstance(config, list) or not config:
+            raise ValueError("'config' must be a non-empty list of sub-agent definitions")
+        for i, agent_def in enumerate(config):
+            if not isinstance(agent_def, dict):
+                raise ValueError(f"'config[{i}]' must be an object with {', '.join(AGENT_FIELDS)}")
+            missing = [field for field in AGENT_FIELDS if not isinstance(agent_def.get(field), str) or not agent_def[field].strip()]
+            if missing:
+                raise ValueError(f"'config[{i}]' needs non-empty string fields: {', '.join(missing)}")
+        return config
+
+    def _worker(self):
+        """
+        Takes job ids off the queue and runs them until the process exits.
+        """
+        while True:
+            job_id = self.queue.get()
+            job = self.store.get(job_id)
+            if job is None:
+                continue
+            with self.lock:
+                self.busy += 1
+            begin = time.time()
+            self.store.update(job_id, status="running", started=begin)
+            try:
+                agent = self._run_job(job)
+                self.store.update(job_id, status="completed", results=agent.results,
+                                  synthesis=agent.synthesis, finished=time.time())
+                outcome = "completed"
+            except Exception as e:
+                console.print(f"[red]Job {job_id} failed: {e}[/red]")
+                partial = self.active.get(job_id)
+                self.store.update(job_id, status="failed", error=str(e),
+                                  results=partial.results if partial else [], finished=time.time())
+                outcome = "failed"
+            finally:
+                self.active.pop(job_id, None)
+                with self.lock:
+                    self.busy -= 1
+                    self.busy_seconds += time.time() - begin
+            with self.lock:
+                self.counters[outcome] += 1
+
+    def _run_job(self, job: dict):
+        """
+        Runs a single job through MainAgent (Scenario 1) or MainAgentScenario2 and returns the agent.
+        """
+        if job["mode"] == "existing_config":
+            agent = MainAgentScenario2(job["problem"], job["config"], cache=self.cache)
+            self.active[job["id"]] = agent
+            agent.run()
+            return agent
+        agent = MainAgent(job["problem"], job["num_agents"], cache=self.cache, save_lock=self.config_lock)
+        self.active[job["id"]] = agent
+        agent.run()
+        return agent
+
+    def status(self, job_id: str):
+        """
+        Returns the stored job, with partial results filled in while it is still running.
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        agent = self.active.get(job_id)
+        if agent is not None:
+            job["results"] = list(agent.results)
+        return job
+
+    def metrics(self) -> dict:
+        """
+        Returns queue depth, worker utilisation, job counters and response cache hit rate.
+        """
+        with self.lock:
+            uptime = time.time() - self.started
+            metrics = {
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize,
+                "workers": self.workers,
+                "busy_workers": self.busy,
+                "worker_utilisation": round(self.busy_seconds / (uptime * self.workers), 4) if uptime else 0.0,
+                "uptime_seconds": round(uptime, 1),
+                "jobs": dict(self.counters),
+            }
+        if self.cache is not None and not self.cache.bypass:
+            metrics["cache"] = {"hits": self.cache.hits, "misses": self.cache.misses,
+                                "hit_rate": round(self.cache.hit_rate, 4)}
+        return metrics
+
+# ---------------------------
+# HTTP Endpoints
+# ---------------------------
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs               -> submit a job ({"problem", "num_agents"} or {"problem", "config_file"|"config"})
+    GET  /jobs/<id>          -> job status and results
+    GET  /jobs/<id>/stream   -> newline-delimited JSON events as sub-agent results arrive
+    GET  /metrics            -> queue depth and worker utilisation
+    """
+    service = None  # Set by serve()
+    poll_interval = 0.5
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self._send_json(404, {"error": "Not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("Request body must be a JSON object")
+            job = self.service.submit(payload)
+        except (ValueError, KeyError) as e:
+            return self._send_json(400, {"error": str(e)})
+        except queue.Full:
+            return self._send_json(429, {"error": "Job queue is full, retry later"})
+        self._send_json(202, job)
+
+    def do_GET(self):
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        if parts == ["metrics"]:
+            return self._send_json(200, self.service.metrics())
+        if len(parts) == 2 and parts[0] == "jobs":
+            job = self.service.status(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": "Unknown job"})
+            return self._send_json(200, job)
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "stream":
+            return self._stream(parts[1])
+        self._send_json(404, {"error": "Not found"})
+
+    def _stream(self, job_id: str):
+        """
+        Streams job progress as NDJSON until the job completes or fails.
+        """
+        job = self.service.status(job_id)
+        if job is None:
+            return self._send_json(404, {"error": "Unknown job"})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        sent, last_status = 0, None
+        try:
+            while True:
+                job = self.service.status(job_id)
+                for result in job["results"][sent:]:
+                    self._write_event({"event": "result", **result})
+                sent = len(job["results"])
+                if job["status"] != last_status:
+                    last_status = job["status"]
+                    self._write_event({"event": "status", "status": last_status})
+                if last_status in ("completed", "failed"):
+                    self._write_event({"event": "done", "status": last_status,
+                                       "synthesis": job["synthesis"], "error": job["error"]})
+                    return
+                time.sleep(self.poll_interval)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def _write_event(self, event: dict):
+        self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def _send_json(self, code: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        console.print(f"[dim]{self.address_string()} - {format % args}[/dim]")
+
+
+def serve(host: str, port: int, workers: int, max_queue: int, db_path: str, use_cache: bool = True):
+    """
+    Starts the job service and blocks serving HTTP requests.
+    """
+    cache = ResponseCache(bypass=not use_cache)
+    service = JobService(JobStore(db_path), workers=workers, max_queue=max_queue, cache=cache)
+    service.start()
+    JobRequestHandler.service = service
+    httpd = ThreadingHTTPServer((host, port), JobRequestHandler)
+    console.rule(f"[bold green]DISTRIBUTED REASONING AGENT SERVER[/bold green] http://{host}:{port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        console.print("[yellow]Shutting down; queued jobs will resume on next start.[/yellow]")
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless job server for the Distributed Reasoning Agent.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2, help="Number of jobs run concurrently.")
+    parser.add_argument("--max-queue", type=int, default=32, help="Queued jobs accepted before returning 429.")
+    parser.add_argument("--db", default="jobs.db", help="SQLite file holding the persistent job queue.")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk sub-agent response cache.")
+    args = parser.parse_args()
+    serve(args.host, args.port, max(1, args.workers), max(1, args.max_queue), args.db, not args.no_cache)
@@ -0,0 +1,63 @@
+import threading
+from rich.console import Console
+from sub_agent import query_ollama
+
+console = Console()
+
+PREFIX_TEMPLATE = """Problem Context:
+{problem}
+
+Read the problem context above. Several expert tasks about it will follow. Reply with OK.
+"""
+
+SUFFIX_TEMPLATE = """Task for {name} ({task_type}):
+{task_prompt}
+
+Using the problem context above, provide your final answer in no more than 5 concise sentences.
+"""
+
+class SharedProblemContext:
+    def __init__(self, problem: str, model: str = None, keep_alive: str = "10m"):
+        """
+        Evaluates the problem statement once per model and lets every sub-agent continue from the
+        resulting Ollama token state, so the shared prefix is not re-prefilled per agent.
+        'model' is used when prime() or run() is not given one; sub-agents pass their own.
+        """
+        self.problem = problem
+        self.model = model
+        self.keep_alive = keep_alive
+        self.contexts = {}    # model -> context tokens, [] if Ollama returned none (priming is not retried)
+        self.prefill_seconds = 0.0
+        self.prefix_tokens = 0
+        self.lock = threading.Lock()
+
+    def prime(self, model: str = None) -> list:
+        """
+        Prefills the problem statement (once per model) and returns the context tokens, or [] if there are none.
+        """
+        model = model or self.model
+        with self.lock:
+            if model not in self.contexts:
+                stats = {}
+                query_ollama(PREFIX_TEMPLATE.format(problem=self.problem), model=model,
+                             options={"num_predict": 1}, keep_alive=self.keep_alive, stats=stats)
+                self.contexts[model] = stats.get("context") or []
+                self.prefill_seconds += stats.get("prompt_eval_duration", 0) / 1e9
+                self.prefix_tokens = stats.get("prompt_eval_count", 0)
+                if not self.contexts[model]:
+                    console.print(f"[yellow]Ollama returned no context for {model}; sub-agents will send the full prompt.[/yellow]")
+            return self.contexts[model]
+
+    def run(self, name: str, task_type: str, task_prompt: str, options: dict = None, on_token=None,
+            stats: dict = None, model: str = None) -> str:
+        """
+        Runs one sub-agent task as a short suffix continuing from the shared problem context of its model.
+        Falls back to a full prompt if the context could not be primed.
+        """
+        model = model or self.model
+        context = self.prime(model)
+        suffix = SUFFIX_TEMPLATE.format(name=name, task_type=task_type, task_prompt=task_prompt)
+        if not context:
+            suffix = f"Problem Context:\n{self.problem}\n\n{suffix}"
+        return query_ollama(suffix, model=model, options=options, on_token=on_token,
+                            context=context, keep_alive=self.keep_alive, stats=stats)
@@ -0,0 +1,161 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from rich.console import Console, Group
+from rich.live import Live
+from rich.markup import escape
+from rich.panel import Panel
+from rich.table import Table
+from rich.text import Text
+
+console = Console()
+
+MAX_PARALLEL_AGENTS = 4
+PANEL_TAIL_CHARS = 600  # Only the tail of each answer is shown while it streams
+
+class AgentStream:
+    """
+    Accumulates the streamed chunks of one sub-agent and its timing.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.chunks = []
+        self.status = "waiting"
+        self.started = None
+        self.first_token = None
+        self.finished = None
+
+    def start(self):
+        self.status = "running"
+        self.started = time.time()
+
+    def add(self, chunk: str):
+        if self.first_token is None:
+            self.first_token = time.time()
+        self.chunks.append(chunk)
+
+    def finish(self, status: str = "done"):
+        self.status = status
+        self.finished = time.time()
+
+    @property
+    def ttft(self):
+        """
+        Seconds from task start to the first streamed token, or None if nothing arrived.
+        """
+        if self.started is None or self.first_token is None:
+            return None
+        return self.first_token - self.started
+
+    @property
+    def tokens_per_second(self):
+        """
+        Streamed chunks (one token each from Ollama) per second after the first token.
+        """
+        end = self.finished or time.time()
+        if self.first_token is None or end <= self.first_token:
+            return None
+        return len(self.chunks) / (end - self.first_token)
+
+class LiveAgentBoard:
+    """
+    Thread-safe set of AgentStreams rendered as one Rich panel per sub-agent.
+    """
+    STATUS_STYLES = {"waiting": "dim", "running": "blue", "done": "green", "failed": "red"}
+
+    def __init__(self, names):
+        self.lock = threading.Lock()
+        self.streams = {name: AgentStream(name) for name in names}
+
+    def add(self, name: str):
+        """
+        Adds a panel for an agent that was not known up front (e.g. in pipelined mode).
+        """
+        with self.lock:
+            self.streams.setdefault(name, AgentStream(name))
+
+    def start(self, name: str):
+        with self.lock:
+            self.streams[name].start()
+
+    def token_callback(self, name: str):
+        """
+        Returns an on_token callback that appends chunks to the named agent's stream.
+        """
+        def on_token(chunk: str):
+            with self.lock:
+                self.streams[name].add(chunk)
+        return on_token
+
+    def finish(self, name: str, status: str = "done"):
+        with self.lock:
+            self.streams[name].finish(status)
+
+    def __rich__(self):
+        with self.lock:
+            panels = []
+            for stream in self.streams.values():
+                text = "".join(stream.chunks)
+                if len(text) > PANEL_TAIL_CHARS:
+                    text = "..." + text[-PANEL_TAIL_CHARS:]
+                subtitle = _format_rate(stream)
+                panels.append(Panel(
+                    Text(text or stream.status),
+                    title=f"{escape(stream.name)} ({stream.status})",
+                    subtitle=subtitle,
+                    border_style=self.STATUS_STYLES.get(stream.status, "dim"),
+                ))
+        return Group(*panels)
+
+    def stats_table(self) -> Table:
+        """
+        Returns a table of time-to-first-token and tokens per second per agent.
+        """
+        table = Table(title="Streaming Statistics", show_header=True, header_style="bold magenta")
+        table.add_column("Agent Name", style="cyan")
+        table.add_column("Time to First Token", style="green", justify="right")
+        table.add_column("Tokens/s", style="yellow", justify="right")
+        table.add_column("Total Time", style="blue", justify="right")
+        with self.lock:
+            for stream in self.streams.values():
+                total = stream.finished - stream.started if stream.finished and stream.started else None
+                table.add_row(
+                    stream.name,
+                    f"{stream.ttft:.2f}s" if stream.ttft is not None else "-",
+                    f"{stream.tokens_per_second:.1f}" if stream.tokens_per_second is not None else "-",
+                    f"{total:.2f}s" if total is not None else "-",
+                )
+        return table
+
+def _format_rate(stream: AgentStream) -> str:
+    parts = []
+    if stream.ttft is not None:
+        parts.append(f"TTFT {stream.ttft:.2f}s")
+    if stream.tokens_per_second is not None:
+        parts.append(f"{stream.tokens_per_second:.1f} tok/s")
+    return " | ".join(parts)
+
+def execute_agents_live(agents, problem: str, cascade=None, cache=None, shared_context=None,
+                        max_workers: int = MAX_PARALLEL_AGENTS) -> list:
+    """
+    Executes sub-agents concurrently, rendering each one's answer live as tokens arrive.
+    Returns results in agent order as [{"agent_name": ..., "result": ...}].
+    """
+    board = LiveAgentBoard([agent.name for agent in agents])
+
+    def run(agent):
+        board.start(agent.name)
+        try:
+            result = agent.execute(problem, cascade=cascade, on_token=board.token_callback(agent.name), cache=cache,
+                                   shared_context=shared_context)
+        except Exception:
+            board.finish(agent.name, "failed")
+            raise
+        board.finish(agent.name, "done" if result else "failed")
+        return {"agent_name": agent.name, "result": result}
+
+    with Live(board, console=console, refresh_per_second=8, vertical_overflow="visible"):
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(agents)))) as executor:
+            results = list(executor.map(run, agents))
+    console.print(board.stats_table())
+    return results
@@ -1,10 +1,26 @@
 import re
 import requests
 import json
+import threading
+from requests.adapters import HTTPAdapter
 from rich.console import Console
 
 console = Console()
 
+# Shared HTTP session so concurrent callers reuse pooled keep-alive connections to Ollama.
+_session = requests.Session()
+_request_slots = None  # Optional global cap on in-flight Ollama requests
+
+def configure_ollama_client(pool_size: int = 10, max_concurrent_requests: int = None):
+    """
+    Sizes the shared connection pool and optionally caps the number of concurrent Ollama requests.
+    """
+    global _request_slots
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    _session.mount("http://", adapter)
+    _session.mount("https://", adapter)
+    _request_slots = threading.BoundedSemaphore(max_concurrent_requests) if max_concurrent_requests else None
+
 class SubAgent:
     def __init__(self, name: str, task_type: str, task_prompt: str):
         """
@@ -15,13 +31,45 @@ class SubAgent:
         self.task_type = task_type
         self.task_prompt = task_prompt
         self.llm_model = "llama3"
+        self.options = None   # Ollama generation options, e.g. {"temperature": 0}
 
-    def execute(self, problem: str) -> str:
+    def execute(self, problem: str, cascade=None, on_token=None, cache=None, shared_context=None) -> str:
         """
         Executes the sub-agent's task by sending a prompt (combining its task_prompt with the overall problem)
         to the LLM and returns the final answer.
+        If a ModelCascade is given, the task runs on its small model first and escalates only on failure.
+        'on_token' receives streamed chunks of the answer as they arrive.
+        If a ResponseCache is given, a stored answer for the same model, agent, problem and options is reused.
+        If a SharedProblemContext is given (and no cascade), only the task suffix is sent, continuing from
+        the already-evaluated problem statement.
+        """
+        if cache is not None:
+            model = cascade.describe() if cascade is not None else self.llm_model
+            key = cache.make_key(model, self.to_dict(), problem, self.options)
+            cached = cache.get(key)
+            if cached is not None:
+                if on_token is not None:
+                    on_token(cached)
+                return cached
+
+        prompt = self.build_prompt(problem)
+        if cascade is not None:
+            result = cascade.run(prompt, name=self.name, options=self.options, on_token=on_token)
+        elif shared_context is not None:
+            result = shared_context.run(self.name, self.task_type, self.task_prompt, options=self.options,
+                                        on_token=on_token, model=self.llm_model)
+        else:
+            result = query_ollama(prompt, model=self.llm_model, options=self.options, on_token=on_token)
+        result = re.sub(r'[\x00-\x1f]+', ' ', result)
+        if cache is not None:
+            cache.put(key, result)
+        return result
+
+    def build_prompt(self, problem: str) -> str:
         """
-        prompt = f"""Task for {self.name} ({self.task_type}):
+        Returns the full task prompt (task instructions followed by the problem context).
+        """
+        return f"""Task for {self.name} ({self.task_type}):
 {self.task_prompt}
 
 Problem Context:
@@ -29,9 +77,6 @@ Problem Context:
 
 Provide your final answer in no more than 5 concise sentences.
 """
-        result = query_ollama(prompt)
-        result = re.sub(r'[\x00-\x1f]+', ' ', result)
-        return result
 
     def to_dict(self) -> dict:
         """
@@ -43,25 +88,53 @@ Provide your final answer in no more than 5 concise sentences.
             "task_prompt": self.task_prompt
         }
 
-def query_ollama(prompt: str) -> str:
+def query_ollama(prompt: str, model: str = "llama3", options: dict = None, on_token=None,
+                 context: list = None, keep_alive: str = None, stats: dict = None, format=None) -> str:
     """
     Sends a prompt to the LLM via the Ollama API and returns the generated response.
+    'options' are passed through as Ollama generation options (temperature, num_ctx, ...).
+    If 'on_token' is given, it is called with each chunk of text as it arrives.
+    'context' continues from the token state returned by an earlier call, and 'keep_alive'
+    keeps the model loaded between calls. If a 'stats' dict is given, it is filled with the
+    final chunk's metadata (context, prompt_eval_count, prompt_eval_duration, eval_count, ...).
+    'format' is Ollama's structured-output format: "json" or a JSON schema.
     """
     url = "http://localhost:11434/api/generate"
     headers = {"Content-Type": "application/json"}
-    payload = {"model": "llama3", "prompt": prompt, "stream": True}
+    payload = {"model": model, "prompt": prompt, "stream": True}
+    if options:
+        payload["options"] = options
+    if context:
+        payload["context"] = context
+    if keep_alive:
+        payload["keep_alive"] = keep_alive
+    if format:
+        payload["format"] = format
+    slots = _request_slots
     try:
-        response = requests.post(url, json=payload, headers=headers, stream=True)
-        response.raise_for_status()
-        result = ""
-        for line in response.iter_lines():
-            if line:
-                decoded_line = line.decode("utf-8")
-                data = json.loads(decoded_line)
-                result += data.get("response", "")
-                if data.get("done"):
-                    break
-        return result.strip()
+        if slots is not None:
+            slots.acquire()
+        try:
+            with _session.post(url, json=payload, headers=headers, stream=True) as response:
+                response.raise_for_status()
+                chunks = []
+                for line in response.iter_lines():
+                    if line:
+                        decoded_line = line.decode("utf-8")
+                        data = json.loads(decoded_line)
+                        chunk = data.get("response", "")
+                        if chunk:
+                            chunks.append(chunk)
+                            if on_token is not None:
+                                on_token(chunk)
+                        if data.get("done"):
+                            if stats is not None:
+                                stats.update({k: v for k, v in data.items() if k not in ("response", "done")})
+                            break
+        finally:
+            if slots is not None:
+                slots.release()
+        return "".join(chunks).strip()
     except Exception as e:
         console.print(f"[red]Error in query_ollama: {e}[/red]")
         return ""
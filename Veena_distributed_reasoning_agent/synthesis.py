@@ -0,0 +1,121 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from rich.console import Console
+from sub_agent import query_ollama
+
+console = Console()
+
+# llama3 has an 8k token context; keep every prompt well inside it.
+SYNTHESIS_TOKEN_BUDGET = 3000   # Max tokens of findings sent to the final synthesis prompt
+CHUNK_TOKEN_BUDGET = 1500       # Max tokens of findings sent to a single chunk summary
+MAX_PARALLEL_SUMMARIES = 4
+MAX_REDUCE_LEVELS = 5
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token) used to bound prompt sizes.
+    """
+    return len(text) // 4 + 1
+
+def build_synthesis_prompt(problem: str, findings: list) -> str:
+    """
+    Builds the final synthesis prompt from the problem and a list of agent findings.
+    """
+    return f"""Using the following findings from expert agents, synthesize a cohesive plan to solve the problem.
+Problem:
+{problem}
+
+Agent Findings:
+{json.dumps(findings, indent=2)}
+
+Your synthesis should include:
+1. A Problem Overview
+2. Key Findings from each agent
+3. Proposed Solutions
+4. Recommended Action Items
+
+Provide your answer in clear, concise bullet points.
+"""
+
+def chunk_findings(findings: list, max_tokens: int) -> list:
+    """
+    Groups findings into consecutive chunks whose serialized size stays under max_tokens.
+    A single finding larger than the budget gets a chunk of its own.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for finding in findings:
+        tokens = estimate_tokens(json.dumps(finding, indent=2))
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(finding)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def summarize_chunk(problem: str, chunk: list, label: str) -> list:
+    """
+    Condenses a chunk of findings into a single finding named 'label' that keeps each agent's key points.
+    If the LLM returns nothing, the chunk's findings are kept as they are so that none are lost.
+    """
+    prompt = f"""Condense the following findings from expert agents into one short summary.
+Keep every concrete fact, risk and recommendation, attribute each point to its agent, and drop repetition.
+
+Problem:
+{problem}
+
+Agent Findings:
+{json.dumps(chunk, indent=2)}
+
+Respond with the condensed findings only, in no more than {4 + 2 * len(chunk)} concise sentences.
+"""
+    summary = query_ollama(prompt)
+    if not summary:
+        names = ", ".join(finding["agent_name"] for finding in chunk)
+        console.print(f"[red]Empty summary for {label}; keeping the findings of {names} unsummarized.[/red]")
+        return chunk
+    return [{"agent_name": label, "result": summary}]
+
+def reduce_findings(problem: str, findings: list, budget: int = None, chunk_budget: int = None,
+                    max_workers: int = MAX_PARALLEL_SUMMARIES) -> list:
+    """
+    Summarizes chunks of findings in parallel, level by level, until the findings fit in budget
+    (SYNTHESIS_TOKEN_BUDGET by default). Summaries are labelled "summary <level>.<chunk>", so names do not grow.
+    Stops early, with a warning, when a level does not shrink the findings or MAX_REDUCE_LEVELS is reached.
+    """
+    budget = budget or SYNTHESIS_TOKEN_BUDGET
+    chunk_budget = chunk_budget or CHUNK_TOKEN_BUDGET
+    tokens = estimate_tokens(json.dumps(findings, indent=2))
+    level = 1
+    while tokens > budget:
+        if level > MAX_REDUCE_LEVELS:
+            console.print(f"[yellow]Findings still use ~{tokens} tokens after {MAX_REDUCE_LEVELS} levels "
+                          f"(budget {budget}); the synthesis prompt will exceed it.[/yellow]")
+            break
+        chunks = chunk_findings(findings, chunk_budget)
+        console.print(f"[blue]Hierarchical synthesis level {level}: {len(findings)} findings -> {len(chunks)} chunk summaries[/blue]")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            summaries = list(executor.map(lambda args: summarize_chunk(problem, args[1], f"summary {level}.{args[0] + 1}"),
+                                          enumerate(chunks)))
+        reduced = [finding for summary in summaries for finding in summary]
+        reduced_tokens = estimate_tokens(json.dumps(reduced, indent=2))
+        if reduced_tokens >= tokens:
+            console.print(f"[yellow]Level {level} did not shrink the findings (~{tokens} -> ~{reduced_tokens} tokens); "
+                          f"stopping with ~{tokens} tokens against a budget of {budget}.[/yellow]")
+            break
+        findings, tokens = reduced, reduced_tokens
+        level += 1
+    return findings
+
+def synthesize_findings(problem: str, findings: list, mode: str = "auto") -> str:
+    """
+    Produces the final integrated plan.
+    mode "single" sends every finding in one prompt, "hierarchical" map-reduces until the findings
+    fit in a single chunk, and "auto" map-reduces only when they exceed SYNTHESIS_TOKEN_BUDGET.
+    """
+    if mode == "hierarchical":
+        findings = reduce_findings(problem, findings, budget=CHUNK_TOKEN_BUDGET)
+    elif mode == "auto":
+        findings = reduce_findings(problem, findings)
+    return query_ollama(build_synthesis_prompt(problem, findings))